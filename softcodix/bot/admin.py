@@ -1,7 +1,47 @@
 from django.contrib import admin
-from .models import PageContent
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .leads import EXPORT_FORMATS, export_lines
+from .models import Lead, LeadAnswer, LeadOutbox, PageContent
 
 @admin.register(PageContent)
 class PageContentAdmin(admin.ModelAdmin):
     list_display = ("url", "content")
     search_fields = ("url", "content")
+
+
+@admin.register(LeadOutbox)
+class LeadOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "attempts", "next_attempt_at", "created_at", "sent_at", "last_error")
+    list_filter = ("status",)
+
+
+def export_response(queryset, fmt):
+    _, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(export_lines(fmt, queryset), content_type=content_type)
+    filename = f"leads-{timezone.now():%Y%m%d-%H%M}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+class LeadAnswerInline(admin.TabularInline):
+    model = LeadAnswer
+    extra = 0
+
+
+@admin.register(Lead)
+class LeadAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "service", "name", "phone", "email")
+    list_filter = ("service", "created_at")
+    search_fields = ("name", "phone", "email")
+    date_hierarchy = "created_at"
+    inlines = [LeadAnswerInline]
+    actions = ["export_csv", "export_jsonl"]
+
+    @admin.action(description="Export selected leads as CSV")
+    def export_csv(self, request, queryset):
+        return export_response(queryset, "csv")
+
+    @admin.action(description="Export selected leads as JSONL")
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, "jsonl")
@@ -0,0 +1,585 @@
+"""Table-driven conversation flow for the Dialogflow webhook
+
+A turn is routed by (intent, context kind, step) through one dict lookup to a
+handler. The transitions are generated once from SERVICE_QUESTIONS at import
+time; adding a service means adding its questions and keywords, nothing else.
+Answers and contact details are kept server-side (bot/state_store.py); the
+contexts only carry the state token and the question index / collect step.
+"""
+import logging
+import re
+from functools import partial
+from django.conf import settings
+from django.db import DatabaseError
+from .jsoncodec import StaticResponse, dumps, json_response, raw_response
+from .leads import save_lead
+from .state_store import get_state_store, new_token
+
+SERVICE_QUESTIONS = {
+    "website": [
+        "What type of website do you need? (Business / E-commerce / Portfolio / Blog )",
+        "Approximately how many pages do you need?",
+        "What is your budget range?"
+    ],
+    "mobile-app": [
+        "Do you need Android, iOS, or both?",
+        "What is the purpose of the app? (Business , E-commerce , Social , etc.)",
+        "How many users are expected?",
+        "Any special features needed? (Push notifications, payment, etc.)",
+        "What is your budget range?"
+    ],
+    "marketing": [
+        "What type of marketing services do you need? (Social , SEO, Paid Ads, Email , etc.)",
+        "Which platforms would you like to focus on? (Facebook , Instagram , Google, TikTok, etc.)",
+        "What is your approximate monthly marketing budget?",
+        "Who is your target audience? (Age, location, interests, profession, etc.)",
+        "Are there any ongoing marketing campaigns? If yes, could you share a brief overview?"
+    ],
+    "chatbot": [
+        "Which platform do you need the chatbot for? (Website , WhatsApp , Facebook)",
+        "What is the purpose of the chatbot? (Customer support, lead generation, AI Assistant)",
+        "In which language should the chatbot reply? (English, Urdu, both)",
+        "Do you need an AI-powered chatbot or a simple rule-based one?"
+    ],
+    "design": [
+        "What type of design do you need? (Logo, Branding, Social Media Posts, UI/UX, Print)",
+        "If you need a logo, what is the business name and is there a tagline?",
+        "In which file format do you need the final design? (PNG, PSD, AI, PDF)",
+        "What is your budget range?"
+    ]
+}
+
+SERVICE_KEYWORDS = {
+    "website": ["website", "web", "site", "webpage"],
+    "mobile-app": ["app", "mobile", "application", "android", "ios", "apk"],
+    "marketing": ["marketing", "ads", "seo", "social media", "facebook ads", "instagram ads"],
+    "chatbot": ["chatbot", "bot", "chat bot", "whatsapp bot"],
+    "design": ["design", "logo", "graphics", "branding", "ui", "ux"]
+}
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_INTENT = "Default Fallback Intent"
+SERVICE_CONTEXT, COLLECT_CONTEXT = "service", "collect"
+ANY = object()   # wildcard step in a transition key
+
+SERVICE_LIFESPAN = 20
+COLLECT_LIFESPAN = 10
+
+HELPLINE_RESPONSE = {
+    "fulfillmentMessages": [
+        {
+            "text": {
+                "text": [
+                    "📞 Our helpline number is: 02138899998\nFeel free to call us anytime during business hours. We're here to help! 😊"
+                ]
+            }
+        },
+        {
+            "payload": {
+                "richContent": [
+                    [
+                        {
+                            "icon": {
+                                "type": "chevron_right",
+                                "color": "#25D366"
+                            },
+                            "text": "📱 WhatsApp",
+                            "type": "button",
+                            "link": "https://wa.me/923151179953"
+                        }
+                    ]
+                ]
+            }
+        }
+    ]
+}
+
+
+class LLMTurn:
+    """Returned by handle_webhook_turn when the reply has to come from the LLM handler"""
+
+    __slots__ = ("user_query", "session")
+
+    def __init__(self, user_query, session=""):
+        self.user_query = user_query
+        self.session = session
+
+
+class LLMFollowup:
+    """Returned by handle_webhook_turn for the follow-up event hit of a deferred LLM turn"""
+
+    __slots__ = ("session", "attempt")
+
+    def __init__(self, session, attempt):
+        self.session = session
+        self.attempt = attempt
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+class KeywordMatcher:
+    """Whole-word keyword / phrase matcher over a {service: [keywords]} table
+
+    Keywords are split into words and indexed by their first word, so a query
+    is scanned once, word by word, with one dict lookup per word - the cost
+    does not grow with the number of synonyms. Matching is on whole words
+    ("ui" no longer fires inside "build"), longest phrase first, and a
+    trailing plural "s" is tolerated ("apps", "websites").
+    """
+
+    __slots__ = ("starts", "singles")
+
+    def __init__(self, service_keywords):
+        starts = {}
+        for service, keywords in service_keywords.items():
+            for keyword in keywords:
+                words = tuple(WORD_RE.findall(keyword.lower()))
+                if words:
+                    starts.setdefault(words[0], {}).setdefault(words[1:], service)
+        # first word -> ((remaining words, service), ...) longest phrase first
+        self.starts = {
+            first: tuple(sorted(tails.items(), key=lambda item: len(item[0]), reverse=True))
+            for first, tails in starts.items()
+        }
+        self.singles = {first: tails[()] for first, tails in starts.items() if () in tails}
+
+    def matches(self, query):
+        """[(position, phrase, service)] for every non-overlapping hit, left to right"""
+        words = tuple(WORD_RE.findall(query.lower()))
+        starts, singles, hits, skip_to = self.starts, self.singles, [], 0
+        for i, word in enumerate(words):
+            if i < skip_to:
+                continue
+            candidates = starts.get(word)
+            if candidates is None:
+                # "apps" -> "app", sirf single-word keywords ke liye
+                if word[-1] == "s" and word[:-1] in singles:
+                    hits.append((i, word, singles[word[:-1]]))
+                continue
+            for tail, service in candidates:
+                if words[i + 1:i + 1 + len(tail)] == tail:
+                    skip_to = i + 1 + len(tail)
+                    hits.append((i, " ".join(words[i:skip_to]), service))
+                    break
+        return hits
+
+    def best(self, query):
+        """Highest scoring service, or None
+
+        Each hit scores its phrase length (so "facebook ads" outweighs a lone
+        "app"); on a tie the service mentioned first wins.
+        """
+        hits = self.matches(query)
+        if not hits:
+            return None
+        scores, first_seen = {}, {}
+        for position, keyword, service in hits:
+            scores[service] = scores.get(service, 0) + keyword.count(" ") + 1
+            first_seen.setdefault(service, position)
+        return max(scores, key=lambda service: (scores[service], -first_seen[service]))
+
+
+SERVICE_MATCHER = KeywordMatcher(SERVICE_KEYWORDS)
+
+
+def detect_service_from_query(query):
+    """Detect service intent from user query using keywords"""
+    service = SERVICE_MATCHER.best(query)
+    if service:
+        logger.debug("Keyword detection", extra={"service": service})
+    return service
+
+
+# Context short name -> (kind, service); "website-context" etc. plus the contact-details context
+CONTEXT_KINDS = {f"{service}-context": (SERVICE_CONTEXT, service) for service in SERVICE_QUESTIONS}
+CONTEXT_KINDS["collect-details"] = (COLLECT_CONTEXT, None)
+
+
+class WebhookTurn:
+    """One Dialogflow request, parsed once
+
+    outputContexts are indexed by short name (the part after "/contexts/"),
+    so the active service, the collect-details parameters and lifespans are
+    plain attribute / dict lookups. Exact names also mean "app-context" can
+    never match inside "mobile-app-context".
+    """
+
+    __slots__ = (
+        "user_query", "intent", "parameters", "session", "contexts", "lifespans",
+        "service", "service_params", "collect_params", "context_service", "context_params", "state",
+    )
+
+    def __init__(self, body):
+        query_result = body.get("queryResult") or {}
+        self.user_query = query_result.get("queryText", "")
+        self.intent = (query_result.get("intent") or {}).get("displayName", "")
+        self.parameters = query_result.get("parameters") or {}
+        self.session = body.get("session", "")
+        self.contexts = contexts = {}
+        self.lifespans = lifespans = {}
+        service = service_params = collect_params = None
+        for context in query_result.get("outputContexts") or ():
+            short_name = context.get("name", "").rpartition("/")[2]
+            if short_name in contexts:
+                continue
+            contexts[short_name] = context
+            lifespans[short_name] = context.get("lifespanCount", 0)
+            kind = CONTEXT_KINDS.get(short_name)
+            if kind is None:
+                continue
+            if kind[0] == COLLECT_CONTEXT:
+                collect_params = context.get("parameters", {})
+            elif service is None:
+                service, service_params = kind[1], context.get("parameters", {})
+        self.service = service
+        self.service_params = service_params
+        self.collect_params = collect_params
+        # Filled by dispatch() with the context the routed handler acts on
+        self.context_service = None
+        self.context_params = {}
+        self.state = None   # server-side state, once loaded
+
+    def context_state(self, kind):
+        """(step, service, parameters) of the active context of `kind`, or None"""
+        if kind == SERVICE_CONTEXT:
+            return None if self.service is None else (self.service, self.service, self.service_params)
+        if self.collect_params is None:
+            return None
+        return self.collect_params.get("step") or None, None, self.collect_params
+
+
+# --- Response helpers ------------------------------------------------------------
+
+def reply(text):
+    return json_response({"fulfillmentText": text})
+
+
+def static_reply(text):
+    return StaticResponse({"fulfillmentText": text})
+
+
+# Fixed replies serialized once at import - har hit par sirf bytes wrap hote hain
+HELPLINE = StaticResponse(HELPLINE_RESPONSE)
+SELECT_SERVICE_AGAIN = static_reply("⚠️ Session expired. Please select service again.")
+START_AGAIN = static_reply("⚠️ Session expired. Please start again.")
+INVALID_NAME = static_reply("⚠️ Please enter a valid name (at least 2 characters).")
+INVALID_PHONE = static_reply("⚠️ Please enter a valid phone number (at least 10 digits).")
+INVALID_EMAIL_TEXT = "⚠️ Please enter a valid email address (e.g. name@example.com)."
+TECHNICAL_ISSUE = static_reply("⚠️ Sorry, kuch technical issue hai. Please try again or call us at 02138899998")
+
+# Pehle sawal wala greeting, pre-encoded; sirf session wala context har turn par serialize hota hai
+START_PROMPTS = {
+    service: dumps(
+        f"Great! Aap {service.replace('-', ' ').upper()} development mein interested hain. ✨\n\n"
+        f"Main kuch quick questions puchna chahta hoon taake hum aapki requirements achhe se samajh sakein.\n\n"
+        f"{questions[0]}"
+    )
+    for service, questions in SERVICE_QUESTIONS.items()
+}
+
+
+def service_context(session, service, question_index, token):
+    return {
+        "name": f"{session}/contexts/{service}-context",
+        "lifespanCount": SERVICE_LIFESPAN,
+        "parameters": {"question_index": question_index, "state": token},
+    }
+
+
+def collect_context(session, step, token):
+    return {
+        "name": f"{session}/contexts/collect-details",
+        "lifespanCount": COLLECT_LIFESPAN,
+        "parameters": {"step": step, "state": token},
+    }
+
+
+def load_state(turn):
+    """Server-side state the turn's context points at; None if it expired or belongs to an older flow
+
+    Contexts written before the state store carried the answers / contact
+    details themselves - those conversations carry on from their parameters.
+    """
+    if turn.state is not None:
+        return turn.state
+    params = turn.context_params
+    token = params.get("state")
+    if token is None:
+        turn.state = {
+            "token": new_token(), "service": params.get("service", turn.context_service),
+            "answers": params.get("answers") or {}, "name": params.get("name"), "phone": params.get("phone"),
+        }
+    else:
+        state = get_state_store().get(turn.session)
+        turn.state = state if state is not None and state.get("token") == token else None
+    return turn.state
+
+
+def save_state(turn, state, question_index=None, step=None):
+    """Store the state with the position the outgoing context points at (for resuming without contexts)"""
+    state["question_index"], state["step"] = question_index, step
+    get_state_store().set(turn.session, state)
+
+
+def entity_value(parameters, key, field=None):
+    """Dialogflow entity values arrive either as plain strings or as dicts ({"name": ...} for @sys.person)"""
+    value = parameters.get(key)
+    return value.get(field or key, "") if isinstance(value, dict) else value
+
+
+def first_filled(values, default):
+    return next((v for v in values if isinstance(v, str) and v.strip()), default)
+
+
+# --- Handlers (turn -> HttpResponse / LLMTurn / LLMFollowup) ------------------------
+
+def start_service(turn, service):
+    logger.info("Service selected", extra={"service": service})
+    # Naya flow, naya token - purane flow ke contexts ab is state ko nahi chhoo sakte
+    state = {"token": new_token(), "service": service, "answers": {}}
+    save_state(turn, state, question_index=1)
+    context = dumps(service_context(turn.session, service, 1, state["token"]))
+    return raw_response(b'{"fulfillmentText":%s,"outputContexts":[%s]}' % (START_PROMPTS[service], context))
+
+
+def advance_questions(turn):
+    """Store the answer to the previous question, then ask the next one or move to contact details"""
+    state = load_state(turn)
+    if state is None:
+        return SELECT_SERVICE_AGAIN()
+    service = state["service"] or turn.context_service
+    questions = SERVICE_QUESTIONS[service]
+    question_index = int(float(turn.context_params.get("question_index", 0)))
+    logger.debug("Question flow", extra={"service": service, "question_index": question_index})
+
+    if 0 < question_index <= len(questions):
+        # Question text ke key par - Dialogflow retry kare to jawab overwrite hota hai, double nahi
+        state["answers"][questions[question_index - 1]] = turn.user_query
+
+    if question_index < len(questions):
+        save_state(turn, state, question_index=question_index + 1)
+        return json_response({
+            "fulfillmentText": questions[question_index],
+            "outputContexts": [service_context(turn.session, service, question_index + 1, state["token"])],
+        })
+
+    logger.info("Questions complete, collecting contact details", extra={"service": service})
+    save_state(turn, state, step="name")
+    return json_response({
+        "fulfillmentText": "Perfect! 🎯\n\nAb main aapki contact details collect karta hoon taake humari team aapse contact kar sake.\n\nAapka naam kya hai?",
+        "outputContexts": [collect_context(turn.session, "name", state["token"])],
+    })
+
+
+def collect_name(turn, from_entities):
+    """Name step. `from_entities`: the collect-contact-details intent (Dialogflow already
+    extracted @sys.person); otherwise raw fallback text, which gets validated."""
+    name = entity_value(turn.parameters, "person", "name") if from_entities else None
+    name = name or turn.user_query.strip()
+    if not from_entities and len(name) < 2:
+        return INVALID_NAME()
+    state = load_state(turn)
+    if state is None:
+        return START_AGAIN()
+
+    logger.debug("Contact name collected", extra={"service": state["service"]})
+    state["name"] = name
+    save_state(turn, state, step="phone")
+    return json_response({
+        "fulfillmentText": f"Thanks {name}! 😊\n\nAapka phone number kya hai?",
+        "outputContexts": [collect_context(turn.session, "phone", state["token"])],
+    })
+
+
+def collect_phone(turn, from_entities):
+    phone = turn.parameters.get("phone-number") if from_entities else None
+    phone = phone or turn.user_query.strip()
+    if not from_entities and len(phone) < 10:
+        return INVALID_PHONE()
+    state = load_state(turn)
+    if state is None:
+        return START_AGAIN()
+
+    logger.debug("Contact phone collected", extra={"phone": phone})
+    state["phone"] = phone
+    save_state(turn, state, step="email")
+    return json_response({
+        "fulfillmentText": "Great! 📱\n\nAur aapka email address?",
+        "outputContexts": [collect_context(turn.session, "email", state["token"])],
+    })
+
+
+def collect_email(turn, from_entities):
+    """Last step: assemble the lead, save it (queues the emails) and thank the user"""
+    state = load_state(turn)
+    if state is None:
+        return START_AGAIN()
+    email = turn.user_query.strip()
+    if "@" not in email:
+        # Lead abhi save nahi - outbox isay reject kar deta; context email step par hi rehta hai
+        save_state(turn, state, step="email")
+        return json_response({
+            "fulfillmentText": INVALID_EMAIL_TEXT,
+            "outputContexts": [collect_context(turn.session, "email", state["token"])],
+        })
+
+    # Intent path: Dialogflow entities first; fallback path: values saved in earlier steps first
+    sources = {"name": (entity_value(turn.parameters, "name"), state.get("name")),
+               "phone": (entity_value(turn.parameters, "phone"), state.get("phone"))}
+    if not from_entities:
+        sources = {key: (saved, entity) for key, (entity, saved) in sources.items()}
+    lead_name = first_filled(sources["name"], "Guest User")
+    lead_phone = first_filled(sources["phone"], "Not provided")
+
+    lead_data = {
+        "service": state["service"],
+        "name": lead_name,
+        "phone": lead_phone,
+        "email": email,
+        "answers": state["answers"],
+    }
+    logger.debug("Lead complete", extra={"lead": lead_data})
+
+    try:
+        # Lead DB mein save + durable outbox - `manage.py process_outbox` email bhejta hai
+        save_lead(lead_data, turn.session)
+        get_state_store().delete(turn.session)
+    except DatabaseError:
+        logger.exception("Could not save lead", extra={"service": lead_data["service"]})
+        return TECHNICAL_ISSUE()
+
+    logger.info("Lead saved and queued in outbox", extra={"service": lead_data["service"]})
+    return reply(f"Perfect! ✅\n\nThank you {lead_name}! Aapki details successfully submit ho gayi hain.\n\nHumari team 24 hours ke andar aapse contact karegi. 🚀\n\nKya main aur kuch help kar sakta hoon?")
+
+
+def keyword_or_llm(turn):
+    """No conversation in progress: start a service flow on a keyword match, else ask Gemini"""
+    detected_service = detect_service_from_query(turn.user_query)
+    if detected_service:
+        return start_service(turn, detected_service)
+    logger.debug("Fallback without active context, using Gemini")
+    return LLMTurn(turn.user_query, turn.session)
+
+
+def ask_llm(turn):
+    return LLMTurn(turn.user_query, turn.session)
+
+
+def llm_followup(turn):
+    return LLMFollowup(turn.session, int(float(turn.parameters.get("attempt", 1))))
+
+
+def helpline(turn):
+    return HELPLINE()
+
+
+def session_expired(turn, response):
+    return response()
+
+
+# --- Transition table -------------------------------------------------------------
+
+# Which context kinds an intent looks at, in priority order
+INTENT_CONTEXTS = {
+    "service-questions": (SERVICE_CONTEXT,),
+    "collect-contact-details": (COLLECT_CONTEXT,),
+    FALLBACK_INTENT: (SERVICE_CONTEXT, COLLECT_CONTEXT),
+    **{f"{service}-inquiry": (SERVICE_CONTEXT,) for service in SERVICE_QUESTIONS},
+}
+
+COLLECT_STEPS = {"name": collect_name, "phone": collect_phone, "email": collect_email}
+
+
+def build_transitions():
+    """(intent, context kind, step) -> handler; step is the service for service contexts"""
+    select_again = partial(session_expired, response=SELECT_SERVICE_AGAIN)
+    start_again = partial(session_expired, response=START_AGAIN)
+    table = {
+        ("service-questions", None, None): select_again,
+        ("collect-contact-details", None, None): start_again,
+        ("collect-contact-details", COLLECT_CONTEXT, ANY): start_again,
+        (FALLBACK_INTENT, None, None): keyword_or_llm,
+        (FALLBACK_INTENT, COLLECT_CONTEXT, None): start_again,
+        (FALLBACK_INTENT, COLLECT_CONTEXT, ANY): keyword_or_llm,
+        ("helpline", ANY, ANY): helpline,
+        ("LLMQueryIntent", ANY, ANY): ask_llm,
+    }
+    for service in SERVICE_QUESTIONS:
+        inquiry = f"{service}-inquiry"
+        table[(inquiry, None, None)] = partial(start_service, service=service)
+        for active in SERVICE_QUESTIONS:
+            # Doosri service ka flow chal raha ho to inquiry ko us sawal ka jawab samjho
+            table[(inquiry, SERVICE_CONTEXT, active)] = (
+                partial(start_service, service=service) if active == service else advance_questions
+            )
+        table[("service-questions", SERVICE_CONTEXT, service)] = advance_questions
+        table[(FALLBACK_INTENT, SERVICE_CONTEXT, service)] = advance_questions
+    for step, handler in COLLECT_STEPS.items():
+        table[("collect-contact-details", COLLECT_CONTEXT, step)] = partial(handler, from_entities=True)
+        table[(FALLBACK_INTENT, COLLECT_CONTEXT, step)] = partial(handler, from_entities=False)
+    return table
+
+
+TRANSITIONS = build_transitions()
+
+
+# Intents that only make sense inside a flow: without contexts they resume from the state store,
+# but only into their own phase (questions / contact details)
+RESUMABLE_INTENTS = {"service-questions": SERVICE_CONTEXT, "collect-contact-details": COLLECT_CONTEXT}
+
+
+def resume_state(turn):
+    """Context state rebuilt from the store after the contexts' lifespan ran out, or None
+
+    A stored state in the other phase doesn't count - the turn then gets the
+    usual "Session expired" instead of being routed to Gemini.
+    """
+    state = get_state_store().get(turn.session)
+    if state is None:
+        return None
+    kind = COLLECT_CONTEXT if state.get("step") else SERVICE_CONTEXT
+    if kind != RESUMABLE_INTENTS[turn.intent]:
+        return None
+    turn.state = state
+    if kind == COLLECT_CONTEXT:
+        return COLLECT_CONTEXT, state["step"], None, {"step": state["step"], "state": state["token"]}
+    service = state["service"]
+    return SERVICE_CONTEXT, service, service, {"question_index": state["question_index"], "state": state["token"]}
+
+
+def resolve_state(turn):
+    """(context kind, step, context service, context parameters) the turn's intent should act on"""
+    for kind in INTENT_CONTEXTS.get(turn.intent, ()):
+        state = turn.context_state(kind)
+        if state is not None:
+            return (kind, *state)
+    if turn.intent in RESUMABLE_INTENTS and turn.session:
+        state = resume_state(turn)
+        if state is not None:
+            logger.info("Conversation resumed from state store", extra={"intent": turn.intent})
+            return state
+    return None, None, None, {}
+
+
+def route(intent, kind, step):
+    """Handler for the state - at most three dict lookups, unknown intents go to Gemini"""
+    return (
+        TRANSITIONS.get((intent, kind, step))
+        or TRANSITIONS.get((intent, kind, ANY))
+        or TRANSITIONS.get((intent, ANY, ANY))
+        or ask_llm
+    )
+
+
+def dispatch(turn):
+    """Run one conversation turn; returns an HttpResponse, LLMTurn or LLMFollowup"""
+    if turn.intent == getattr(settings, "LLM_FOLLOWUP_INTENT", "LLMFollowupIntent"):
+        return llm_followup(turn)
+    try:
+        kind, step, turn.context_service, turn.context_params = resolve_state(turn)
+        return route(turn.intent, kind, step)(turn)
+    except DatabaseError:
+        logger.exception("Conversation state store unavailable", extra={"intent": turn.intent})
+        return TECHNICAL_ISSUE()
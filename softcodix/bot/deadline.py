@@ -0,0 +1,47 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from django.db import OperationalError, connection
+
+
+class Deadline:
+    """Time budget for one webhook turn, shared by every stage of the request"""
+
+    __slots__ = ("budget", "started_at", "expires_at")
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def cap(self, timeout):
+        """Stage timeout, never longer than what is left of the budget"""
+        return min(timeout, self.remaining())
+
+
+@contextmanager
+def db_deadline(deadline, every=1000):
+    """Abort SQLite queries that run past the deadline (raises OperationalError: interrupted)"""
+    if deadline is None or connection.vendor != "sqlite":
+        yield
+        return
+    connection.ensure_connection()
+    raw = connection.connection
+    # Har `every` VM instructions par check, non-zero return query ko interrupt karta hai
+    raw.set_progress_handler(lambda: 1 if deadline.expired() else 0, every)
+    try:
+        yield
+    except sqlite3.OperationalError as exc:
+        # DEBUG query logging runs its own SQL outside Django's error wrapper
+        raise OperationalError(*exc.args) from exc
+    finally:
+        raw.set_progress_handler(None, every)
@@ -0,0 +1,188 @@
+import itertools
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+
+# Cache value jab tak Gemini ka jawab nahi aata
+PENDING = "__pending__"
+
+
+class LocalResultStore:
+    """Per-session slot for an LLM answer that finishes after the webhook returned (per process)
+
+    Each deferred turn gets a token, so a late answer to an older question can
+    never land in the slot of a newer one from the same session.
+    """
+
+    def __init__(self, ttl=120):
+        self.ttl = ttl
+        self._slots = {}                 # session -> [token, reply, expires_at]
+        self._tokens = itertools.count(1)
+        self._cond = threading.Condition()
+
+    def _purge(self, now):
+        for session in [s for s, slot in self._slots.items() if slot[2] < now]:
+            del self._slots[session]
+
+    def start(self, session):
+        with self._cond:
+            now = time.monotonic()
+            self._purge(now)
+            token = next(self._tokens)
+            self._slots[session] = [token, None, now + self.ttl]
+            return token
+
+    def put(self, session, token, reply):
+        with self._cond:
+            slot = self._slots.get(session)
+            if slot is None or slot[0] != token:
+                return
+            slot[1] = reply
+            self._cond.notify_all()
+
+    def take(self, session):
+        """Finished answer for the session (removed from the store), or None"""
+        with self._cond:
+            slot = self._slots.get(session)
+            if slot is None or slot[1] is None:
+                return None
+            del self._slots[session]
+            return slot[1]
+
+    def pending(self, session):
+        with self._cond:
+            slot = self._slots.get(session)
+            return slot is not None and slot[2] >= time.monotonic()
+
+    def discard(self, session):
+        with self._cond:
+            self._slots.pop(session, None)
+
+    def wait(self, session, timeout):
+        """Block until the answer is ready; None on timeout or when nothing is pending"""
+        end = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                slot = self._slots.get(session)
+                if slot is None:
+                    return None
+                if slot[1] is not None:
+                    del self._slots[session]
+                    return slot[1]
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    # Async view ke liye - sirf memory aur ek chhota lock, loop block nahi hota
+    async def astart(self, session):
+        return self.start(session)
+
+    async def aput(self, session, token, reply):
+        self.put(session, token, reply)
+
+    async def atake(self, session):
+        return self.take(session)
+
+    async def apending(self, session):
+        return self.pending(session)
+
+    async def adiscard(self, session):
+        self.discard(session)
+
+
+class CacheResultStore:
+    """Same interface on a Django cache alias, so the follow-up hit may land on any worker"""
+
+    poll_interval = 0.05
+
+    def __init__(self, alias, ttl=120):
+        self.alias = alias
+        self.ttl = ttl
+
+    def _key(self, session):
+        return f"llm-result:{session}"
+
+    def start(self, session):
+        token = uuid.uuid4().hex
+        caches[self.alias].set(self._key(session), (token, PENDING), self.ttl)
+        return token
+
+    def put(self, session, token, reply):
+        cache = caches[self.alias]
+        slot = cache.get(self._key(session))
+        if slot is None or slot[0] != token:
+            return
+        cache.set(self._key(session), (token, reply), self.ttl)
+
+    def take(self, session):
+        cache = caches[self.alias]
+        slot = cache.get(self._key(session))
+        if slot is None or slot[1] == PENDING:
+            return None
+        cache.delete(self._key(session))
+        return slot[1]
+
+    def pending(self, session):
+        return caches[self.alias].get(self._key(session)) is not None
+
+    def discard(self, session):
+        caches[self.alias].delete(self._key(session))
+
+    def wait(self, session, timeout):
+        end = time.monotonic() + timeout
+        while True:
+            reply = self.take(session)
+            if reply is not None or not self.pending(session):
+                return reply
+            if time.monotonic() >= end:
+                return None
+            time.sleep(self.poll_interval)
+
+    # Async view: cache ka async API (aget / aset) - redis jaisa network I/O event loop par block na kare
+    async def astart(self, session):
+        token = uuid.uuid4().hex
+        await caches[self.alias].aset(self._key(session), (token, PENDING), self.ttl)
+        return token
+
+    async def aput(self, session, token, reply):
+        cache = caches[self.alias]
+        slot = await cache.aget(self._key(session))
+        if slot is None or slot[0] != token:
+            return
+        await cache.aset(self._key(session), (token, reply), self.ttl)
+
+    async def atake(self, session):
+        cache = caches[self.alias]
+        slot = await cache.aget(self._key(session))
+        if slot is None or slot[1] == PENDING:
+            return None
+        await cache.adelete(self._key(session))
+        return slot[1]
+
+    async def apending(self, session):
+        return await caches[self.alias].aget(self._key(session)) is not None
+
+    async def adiscard(self, session):
+        await caches[self.alias].adelete(self._key(session))
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Process-wide store for deferred LLM answers, configured from settings"""
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                backend = getattr(settings, "LLM_RESULT_BACKEND", "local")
+                ttl = getattr(settings, "LLM_RESULT_TTL", 120)
+                if backend == "local":
+                    _result_store = LocalResultStore(ttl)
+                else:
+                    _result_store = CacheResultStore(backend, ttl)
+    return _result_store
@@ -0,0 +1,63 @@
+from functools import lru_cache
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template import Context
+from django.template.loader import get_template
+from django.template.loader_tags import BlockNode
+
+LOGO_URL = (
+    "https://firebasestorage.googleapis.com/v0/b/image-icons.appspot.com/o/"
+    "Softcodix%20Logo%20-%20Red%26Blue.png?alt=media&token=eaafceb7-ffbc-4c65-9c5c-420d294f34b8"
+)
+
+COMPANY_TEMPLATE = "bot/email/lead_company.html"
+USER_TEMPLATE = "bot/email/lead_user.html"
+
+
+@lru_cache(maxsize=None)
+def compiled_email(name):
+    """Compiled template + its subject/text/html blocks (loaded once per process)"""
+    template = get_template(name).template
+    blocks = {node.name: node for node in template.nodelist.get_nodes_by_type(BlockNode)}
+    return template, blocks
+
+
+def render_email(name, context):
+    """(subject, plain text, html) rendered from one template's blocks
+
+    Only the html block is autoescaped - in the subject and text parts
+    escaping would just show up as literal "&amp;".
+    """
+    template, blocks = compiled_email(name)
+    rendered = {}
+    for block_name, node in blocks.items():
+        block_context = Context(context, autoescape=block_name == "html")
+        with block_context.bind_template(template):
+            rendered[block_name] = node.nodelist.render(block_context)
+    # Subject header mein newline ki ijazat nahi (BadHeaderError) - user input se aa sakti hai
+    subject = " ".join(rendered["subject"].split())
+    return subject, rendered["text"].strip() + "\n", rendered["html"]
+
+
+def lead_context(service, name, phone, email, answers):
+    service = service or ""
+    return {
+        "service": service,
+        "service_label": service.replace("-", " ").upper(),
+        "name": name,
+        "phone": phone,
+        "email": email,
+        "answers": list(answers.items()),
+        "logo_url": LOGO_URL,
+    }
+
+
+def build_lead_messages(context):
+    """Company notification + customer thank-you, each with a plain-text body and an HTML alternative"""
+    messages = []
+    for template_name, to in ((COMPANY_TEMPLATE, settings.LEAD_EMAIL), (USER_TEMPLATE, context["email"])):
+        subject, text, html = render_email(template_name, context)
+        message = EmailMultiAlternatives(subject=subject, body=text, from_email=settings.DEFAULT_FROM_EMAIL, to=[to])
+        message.attach_alternative(html, "text/html")
+        messages.append(message)
+    return messages
@@ -0,0 +1,253 @@
+"""Local stand-ins for external services, used by the benchmarks and tests"""
+import json
+import math
+import multiprocessing
+import random
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # default listen backlog (5) drops SYNs under load
+
+
+class FakeGeminiServer:
+    """Minimal `generateContent` endpoint with configurable latency and error rate
+
+    `latency` is either a number of seconds or a callable returning one, so
+    callers can plug in any distribution.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, reply="Softcodix fake answer", seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.server = StandInHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1beta"
+
+    def _next_delay_and_error(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency(self.rng) if callable(self.latency) else self.latency
+            failed = self.rng.random() < self.error_rate
+        return delay, failed
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # One buffered write per response + TCP_NODELAY, warna keep-alive par
+            # Nagle / delayed-ACK har request mein ~40 ms jod deta hai
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                delay, failed = fake._next_delay_and_error()
+                time.sleep(delay)
+                if failed:
+                    body = json.dumps({"error": {"code": 500, "message": "fake failure"}}).encode()
+                    status = 500
+                else:
+                    body = json.dumps(
+                        {"candidates": [{"content": {"parts": [{"text": fake.reply}]}}]}
+                    ).encode()
+                    status = 200
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass   # client timeout ke baad chala gaya
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LatencyDistribution:
+    """Picklable FakeGeminiServer latency from a spec string
+
+    "fixed:0.5", "uniform:0.2,1.5" or "lognormal:<median>,<sigma>" (seconds).
+    """
+
+    def __init__(self, spec):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {spec!r}")
+
+    def __call__(self, rng):
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.args)
+        median, sigma = self.args
+        return rng.lognormvariate(math.log(median), sigma)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(map(str, self.args))}"
+
+
+def _serve_fake_gemini(ready, stop, kwargs):
+    fake = FakeGeminiServer(**kwargs).start()
+    ready.put(fake.base_url)
+    stop.wait()
+    fake.stop()
+
+
+@contextmanager
+def fake_gemini_process(**kwargs):
+    """FakeGeminiServer in a child process, so its threads don't compete for our GIL
+
+    Yields the base URL. `latency` must be a number or a picklable callable.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop = ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=_serve_fake_gemini, args=(ready, stop, kwargs), daemon=True)
+    process.start()
+    try:
+        yield ready.get(timeout=30)
+    finally:
+        stop.set()
+        process.join(timeout=5)
+
+
+class FakeSMTPServer:
+    """Plain-text SMTP sink (EHLO, AUTH, MAIL/RCPT/DATA) that counts connections and messages
+
+    `handshake_latency` is charged once per connection (stands in for TCP +
+    STARTTLS + login to a remote server), `rtt` on every command reply.
+    """
+
+    def __init__(self, handshake_latency=0.0, rtt=0.0):
+        self.handshake_latency = handshake_latency
+        self.rtt = rtt
+        self.connections = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        server_class = type("StandInSMTPServer", (socketserver.ThreadingTCPServer,), {
+            "daemon_threads": True, "allow_reuse_address": True, "request_queue_size": 1024,
+        })
+        self.server = server_class(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def reply(self, line):
+                time.sleep(fake.rtt)
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                time.sleep(fake.handshake_latency)
+                self.reply("220 fake-smtp ready")
+                for raw in self.rfile:
+                    command = raw.decode("utf-8", "replace").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250-fake-smtp\r\n250 AUTH PLAIN LOGIN")
+                    elif command.startswith("AUTH"):
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        for line in self.rfile:
+                            if line in (b".\r\n", b".\n"):
+                                break
+                        with fake._lock:
+                            fake.messages += 1
+                        self.reply("250 OK queued")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:   # MAIL, RCPT, RSET, NOOP
+                        self.reply("250 OK")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubGeminiResponse:
+    __slots__ = ("status_code", "_data")
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubGeminiSession:
+    """In-process stand-in for the pooled Gemini requests.Session - no sockets, same reply every time
+
+    Patch it in for bot.views.get_session when timing has to be deterministic
+    (replay benchmarks); use FakeGeminiServer when the network path matters.
+    """
+
+    def __init__(self, reply="Softcodix stub answer"):
+        self.reply = reply
+        self.requests = 0
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.requests += 1
+        return StubGeminiResponse(200, {"candidates": [{"content": {"parts": [{"text": self.reply}]}}]})
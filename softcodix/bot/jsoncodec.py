@@ -0,0 +1,86 @@
+"""JSON for the webhook hot path: orjson when installed, stdlib json otherwise
+
+Both codecs parse bytes directly (no request.body.decode()) and render
+compact UTF-8 bytes. Replies that never change are serialized once at import
+with static_response() and only wrapped in a fresh HttpResponse per hit.
+"""
+import json
+from functools import lru_cache
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional - stdlib fallback
+    orjson = None
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+class StdlibCodec:
+    name = "stdlib"
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data):
+        return json.loads(data)   # bytes chalta hai, encoding khud detect hoti hai
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode("utf-8")
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+
+CODECS = {"stdlib": StdlibCodec()}
+if orjson is not None:
+    CODECS["orjson"] = OrjsonCodec()
+
+
+@lru_cache(maxsize=None)
+def get_codec(name=None):
+    """Codec named by the JSON_CODEC setting - "auto" picks orjson when installed"""
+    name = name or getattr(settings, "JSON_CODEC", "auto")
+    if name == "auto":
+        name = "orjson" if "orjson" in CODECS else "stdlib"
+    if name not in CODECS:
+        raise ValueError(f"JSON codec {name!r} is not available (installed: {', '.join(CODECS)})")
+    return CODECS[name]
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+def dumps(obj):
+    return get_codec().dumps(obj)
+
+
+def raw_response(content, status=200):
+    """HttpResponse around already-serialized JSON bytes"""
+    return HttpResponse(content, content_type=JSON_CONTENT_TYPE, status=status)
+
+
+def json_response(data, status=200):
+    """Drop-in for JsonResponse(data) on the fast codec"""
+    return raw_response(dumps(data), status)
+
+
+class StaticResponse:
+    """A reply body serialized once; calling it gives a new HttpResponse (middleware may mutate headers)"""
+
+    __slots__ = ("data", "content", "status")
+
+    def __init__(self, data, status=200):
+        self.data = data
+        self.content = dumps(data)
+        self.status = status
+
+    def __call__(self):
+        return raw_response(self.content, self.status)
@@ -0,0 +1,77 @@
+import csv
+import json
+from django.db import transaction
+from .models import Lead, LeadAnswer
+from .outbox import enqueue_lead_email
+
+EXPORT_FIELDS = ["id", "created_at", "service", "name", "phone", "email", "answers"]
+
+
+def save_lead(lead_data, session=""):
+    """Store the lead + answers and queue its emails, all in one transaction"""
+    with transaction.atomic():
+        lead = Lead.objects.create(
+            service=lead_data.get("service") or "",
+            name=lead_data.get("name") or "",
+            phone=lead_data.get("phone") or "",
+            email=lead_data.get("email") or "",
+            session=session,
+        )
+        LeadAnswer.objects.bulk_create([
+            LeadAnswer(lead=lead, position=position, question=question, answer=str(answer))
+            for position, (question, answer) in enumerate((lead_data.get("answers") or {}).items())
+        ])
+        enqueue_lead_email(lead_data)
+    return lead
+
+
+def iter_leads(queryset=None, chunk_size=2000):
+    """Leads with their answers, fetched chunk by chunk (memory stays flat however many rows)"""
+    queryset = Lead.objects.all() if queryset is None else queryset
+    # iterator() + prefetch: har chunk ke answers ek query mein, poori table memory mein nahi
+    return queryset.order_by("id").prefetch_related("answers").iterator(chunk_size=chunk_size)
+
+
+def lead_record(lead):
+    return {
+        "id": lead.id,
+        "created_at": lead.created_at.isoformat(),
+        "service": lead.service,
+        "name": lead.name,
+        "phone": lead.phone,
+        "email": lead.email,
+        "answers": [{"question": a.question, "answer": a.answer} for a in lead.answers.all()],
+    }
+
+
+class Echo:
+    """File-like object whose write() just returns the line (csv.writer -> generator)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(leads):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for lead in leads:
+        record = lead_record(lead)
+        record["answers"] = " | ".join(f"{a['question']}: {a['answer']}" for a in record["answers"])
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+
+def jsonl_lines(leads):
+    for lead in leads:
+        yield json.dumps(lead_record(lead), ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "jsonl": (jsonl_lines, "application/x-ndjson"),
+}
+
+
+def export_lines(fmt, queryset=None, chunk_size=2000):
+    """Generator of export lines - feed it to a file or a StreamingHttpResponse"""
+    line_writer, _ = EXPORT_FORMATS[fmt]
+    return line_writer(iter_leads(queryset, chunk_size))
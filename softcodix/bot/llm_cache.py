@@ -0,0 +1,128 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+# Prompt template badlo to isko bump karo, purane answers khud invalid ho jayenge
+PROMPT_VERSION = "1"
+
+# Replies starting with these are errors / timeouts and must never be cached
+ERROR_PREFIXES = ("⚠️", "⏳")
+
+PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(user_query):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return SPACE_RE.sub(" ", PUNCT_RE.sub(" ", user_query.lower())).strip()
+
+
+def is_error_reply(reply):
+    return not reply or reply.startswith(ERROR_PREFIXES)
+
+
+def make_key(user_query, context_version=""):
+    raw = f"{PROMPT_VERSION}|{context_version}|{normalize_query(user_query)}"
+    return "gemini:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU with a per-entry TTL (per process)"""
+
+    def __init__(self, maxsize=1000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "backend": "local",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+class DjangoCacheBackend:
+    """Same interface on top of a Django cache alias, so all workers share answers"""
+
+    def __init__(self, alias, ttl=3600):
+        self.alias = alias
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        value = caches[self.alias].get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        # Size bound / LRU eviction is the cache backend's job (e.g. MAX_ENTRIES, redis maxmemory)
+        caches[self.alias].set(key, value, self.ttl)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+    def stats(self):
+        return {"backend": self.alias, "hits": self.hits, "misses": self.misses}
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide Gemini response cache, configured from settings"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                backend = getattr(settings, "GEMINI_CACHE_BACKEND", "local")
+                ttl = getattr(settings, "GEMINI_CACHE_TTL", 3600)
+                if backend == "local":
+                    _response_cache = LRUCache(getattr(settings, "GEMINI_CACHE_SIZE", 1000), ttl)
+                else:
+                    _response_cache = DjangoCacheBackend(backend, ttl)
+    return _response_cache
@@ -0,0 +1,174 @@
+import asyncio
+import atexit
+import itertools
+import math
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class LLMBusy(Exception):
+    """Raised when the LLM executor already has its maximum work queued"""
+
+
+class LLMExecutor:
+    """Long-lived thread pool for outbound LLM calls with a bounded backlog"""
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.submitted = self.rejected = self.completed = self.in_flight = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise LLMBusy("LLM executor queue is full")
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.submitted -= 1
+                self.in_flight -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.completed += 1
+            self.in_flight -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        # Request threads already gave up on pending work - don't make exit wait for it
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self._executor._work_queue.qsize(),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class AsyncClientPool:
+    """Round-robin over several small httpx.AsyncClients
+
+    httpcore's pool does work linear in its connection count on every request,
+    so a single client with hundreds of connections slows down badly (200
+    concurrent calls took 3-6 s instead of ~1 s locally); small shards don't.
+    """
+
+    def __init__(self, max_connections, shard_size):
+        shards = max(1, math.ceil(max_connections / shard_size))
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        # SSL context banana mehenga hai (~50 ms) - sab shards ek hi share karte hain
+        ssl_context = httpx.create_ssl_context()
+        self.clients = [httpx.AsyncClient(limits=limits, verify=ssl_context) for _ in range(shards)]
+        self._next = itertools.cycle(self.clients)
+
+    def post(self, *args, **kwargs):
+        return next(self._next).post(*args, **kwargs)
+
+
+_session = None
+_executor = None
+_async_clients = weakref.WeakKeyDictionary()   # event loop -> AsyncClientPool
+_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide keep-alive session for Gemini (one TLS handshake per pooled connection)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                pool_size = getattr(settings, "LLM_POOL_SIZE", 10)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """Keep-alive async HTTP client for the running event loop (one per ASGI worker loop)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncClientPool(
+            max_connections=getattr(settings, "LLM_ASYNC_MAX_CONNECTIONS", 200),
+            shard_size=getattr(settings, "LLM_ASYNC_SHARD_SIZE", 10),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def get_executor():
+    """Process-wide executor for LLM work (created once, not per request)"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = LLMExecutor(
+                    max_workers=getattr(settings, "LLM_MAX_WORKERS", 10),
+                    max_queue=getattr(settings, "LLM_MAX_QUEUE", 20),
+                )
+    return _executor
+
+
+def connection_stats():
+    """New connections vs requests per upstream host (reused = requests - connections)"""
+    if _session is None:
+        return {}
+    stats = {}
+    for adapter in set(_session.adapters.values()):
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            stats[pool.host] = {
+                "connections": pool.num_connections,
+                "requests": pool.num_requests,
+                "reused": pool.num_requests - pool.num_connections,
+            }
+    return stats
+
+
+def client_stats():
+    return {
+        "connections": connection_stats(),
+        "executor": _executor.stats() if _executor else {},
+    }
+
+
+def shutdown():
+    """Close pooled connections and stop the executor (registered with atexit)"""
+    global _session, _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,126 @@
+"""Structured, non-blocking logging for the webhook
+
+Request threads only build a LogRecord and put it on a queue; a
+QueueListener thread does the formatting, PII redaction and stream I/O.
+Loggers are per module (logging.getLogger(__name__)) and configured from
+settings.LOGGING. Structured fields go in `extra=`; debug lines can be
+sampled, and with the "bot" logger at INFO a debug call is just a level check.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Fields whose values never reach the log stream in clear text
+REDACT_FIELDS = {"phone", "phone-number", "email", "lead_phone", "lead_email"}
+# One pass over the text: an email ("s***@example.com") or a phone-like digit run ("***67")
+PII_RE = re.compile(r"(?P<user>[\w.+-])[\w.+-]*@(?P<domain>[\w-]+\.[\w.-]+)|\+?\d[\d\s-]{6,}(?P<tail>\d{2})")
+
+# Attributes every LogRecord has - anything else came in through `extra=`
+RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def mask(match):
+    if match["domain"]:
+        return f"{match['user']}***@{match['domain']}"
+    return f"***{match['tail']}"
+
+
+def redact_text(text):
+    return PII_RE.sub(mask, text)
+
+
+def redact(value, key=None):
+    """Mask phone/email fields (by key, also nested in dicts/lists) and anything that looks like one"""
+    if key in REDACT_FIELDS and value:
+        return "***"
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger message key=value ...`, or one JSON object per line with as_json=True"""
+
+    def __init__(self, as_json=False):
+        super().__init__(datefmt="%Y-%m-%dT%H:%M:%S")
+        self.as_json = as_json
+
+    def format(self, record):
+        message = redact_text(record.getMessage())
+        fields = {key: redact(value, key) for key, value in vars(record).items() if key not in RECORD_ATTRS}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if self.as_json:
+            line = {"time": self.formatTime(record, self.datefmt), "level": record.levelname,
+                    "logger": record.name, "message": message, **fields}
+            if record.exc_text:
+                line["exc"] = record.exc_text
+            return json.dumps(line, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record, self.datefmt)} {record.levelname} {record.name} {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class SampleDebugFilter(logging.Filter):
+    """Keep only `rate` of DEBUG records (0..1); INFO and above always pass"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """QueueHandler whose listener thread formats and writes to `stream` (stderr by default)
+
+    prepare() does not format on the request thread like the stock
+    QueueHandler; it only snapshots dict/list extras (the caller may mutate
+    them after logging) and resolves tracebacks.
+    """
+
+    def __init__(self, stream=None, as_json=False, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(StructuredFormatter(as_json))
+        self.target = target
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        # "bot" logger propagate=False hai, record sirf is handler ka hai - copy ki zaroorat nahi
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS and isinstance(value, (dict, list)):
+                record.__dict__[key] = copy.deepcopy(value)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass   # stream itna peeche hai ke log drop karna request rokne se behtar hai
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()   # flushes whatever is still queued
+            self.listener = None
+            self.target.close()
+        super().close()
@@ -0,0 +1,73 @@
+import threading
+import time
+from django.conf import settings
+from django.core.mail import get_connection
+
+
+class ReusableConnection:
+    """Email backend connection kept open across sends for up to `window` seconds
+
+    Every fresh SMTP connection to Gmail costs a TCP connect, STARTTLS and a
+    login; reusing one for a burst of leads pays that once. Past the window (or
+    after an error) the connection is closed and the next send opens a new one,
+    so an idle server-side timeout never bites.
+    """
+
+    def __init__(self, window=None, max_messages=None):
+        self.window = window if window is not None else getattr(settings, "EMAIL_REUSE_WINDOW", 30)
+        self.max_messages = max_messages or getattr(settings, "EMAIL_REUSE_MAX_MESSAGES", 100)
+        self._connection = None
+        self._opened_at = 0.0
+        self._messages = 0
+        self.opened = 0
+
+    def get(self):
+        """Open connection to pass to send_lead_email(connection=...)"""
+        if self._connection is not None and (
+            time.monotonic() - self._opened_at > self.window or self._messages >= self.max_messages
+        ):
+            self.close()
+        if self._connection is None:
+            connection = get_connection()
+            connection.open()   # pehle se open ho to send_messages usay band nahi karta
+            self._connection = connection
+            self._opened_at = time.monotonic()
+            self._messages = 0
+            self.opened += 1
+            with _lock:
+                _open_connections.add(self)
+        return self._connection
+
+    def sent(self, count):
+        self._messages += count
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass   # server pehle hi connection gira chuka ho sakta hai
+            self._connection = None
+        with _lock:
+            _open_connections.discard(self)
+
+
+_local = threading.local()
+_open_connections = set()
+_lock = threading.Lock()
+
+
+def thread_connection():
+    """This thread's ReusableConnection (SMTP connections must not be shared between threads)"""
+    reusable = getattr(_local, "connection", None)
+    if reusable is None:
+        reusable = _local.connection = ReusableConnection()
+    return reusable
+
+
+def close_thread_connections():
+    """Close every thread's connection - only call while no sends are in flight"""
+    with _lock:
+        open_now = list(_open_connections)
+    for reusable in open_now:
+        reusable.close()
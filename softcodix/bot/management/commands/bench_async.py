@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from bot import llm_client
+from bot.fakes import fake_gemini_process
+from bot.views import BUSY_REPLY, dialogflow_webhook, dialogflow_webhook_async
+
+
+def llm_body(i, run):
+    return json.dumps({
+        "session": f"projects/bench/agent/sessions/{run}-{i}",
+        "queryResult": {
+            "queryText": f"zqx{run}{i} benchmark question",
+            "intent": {"displayName": "LLMQueryIntent"},
+            "outputContexts": [],
+        },
+    })
+
+
+class ThreadSampler:
+    """Peak thread count while a run is in progress"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = "Compare sync (thread per request) vs async webhook under many concurrent LLM-bound turns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conversations", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=16, help="Sync worker threads (e.g. gunicorn --threads)")
+        parser.add_argument("--latency", type=float, default=0.5, help="Fake Gemini latency (s)")
+
+    def report(self, label, results, wall, peak_threads):
+        latencies = [latency for latency, _ in results]
+        busy = sum(1 for _, reply in results if reply == BUSY_REPLY)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        self.stdout.write(
+            f"{label:<6} | {len(results) / wall:7.1f} turns/s | p50 {p50 * 1000:7.0f} ms "
+            f"p95 {p95 * 1000:7.0f} ms p99 {p99 * 1000:7.0f} ms | busy {busy:>4} | peak threads {peak_threads}"
+        )
+
+    def run_sync(self, n, threads):
+        factory = RequestFactory()
+
+        def one(i):
+            start = time.perf_counter()
+            response = dialogflow_webhook(factory.post("/webhook/", llm_body(i, "s"), content_type="application/json"))
+            return time.perf_counter() - start, json.loads(response.content)["fulfillmentText"]
+
+        with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=threads) as pool:
+            start = time.perf_counter()
+            # Latency includes queueing for a free worker thread, like a real server
+            submitted = [(time.perf_counter(), pool.submit(one, i)) for i in range(n)]
+            results = []
+            for queued_at, future in submitted:
+                _, reply = future.result()
+                results.append((time.perf_counter() - queued_at, reply))
+            wall = time.perf_counter() - start
+        return results, wall, sampler.peak
+
+    def run_async(self, n):
+        factory = AsyncRequestFactory()
+
+        async def one(i):
+            start = time.perf_counter()
+            response = await dialogflow_webhook_async(
+                factory.post("/webhook-async/", llm_body(i, "a"), content_type="application/json")
+            )
+            return time.perf_counter() - start, json.loads(response.content)["fulfillmentText"]
+
+        async def main():
+            return await asyncio.gather(*(one(i) for i in range(n)))
+
+        with ThreadSampler() as sampler:
+            start = time.perf_counter()
+            results = asyncio.run(main())
+            wall = time.perf_counter() - start
+        return results, wall, sampler.peak
+
+    def handle(self, *args, **options):
+        n, threads = options["conversations"], options["threads"]
+        with fake_gemini_process(latency=options["latency"]) as gemini_url, tempfile.TemporaryDirectory() as index_dir:
+            with override_settings(
+                GEMINI_API_BASE=gemini_url,
+                GEMINI_API_KEY="bench",
+                RETRIEVAL_INDEX_DIR=index_dir,
+                LLM_MAX_WORKERS=threads,
+                LLM_POOL_SIZE=threads,
+                LLM_MAX_QUEUE=n,
+            ), contextlib.redirect_stdout(io.StringIO()):
+                llm_client.shutdown()   # executor ko naye settings ke saath banne do
+                sync_run = self.run_sync(n, threads)
+                async_run = self.run_async(n)
+                llm_client.shutdown()
+
+        self.stdout.write(f"{n} concurrent LLM turns, fake Gemini latency {options['latency']} s")
+        self.report("sync", *sync_run)
+        self.report("async", *async_run)
@@ -0,0 +1,99 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bot.web_scrap import scrape_all_pages
+
+
+def make_handler(pages, latency):
+    class SitePageHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, taake connection reuse measure ho
+
+        def do_GET(self):
+            time.sleep(latency)
+            try:
+                index = int(self.path.strip("/").replace("page-", "") or 0)
+            except ValueError:
+                index = pages
+            if index >= pages:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = f'"page-{index}-v1"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            links = "".join(
+                f'<a href="/page-{(index * 7 + k) % pages}">link</a>' for k in range(1, 6)
+            )
+            body = (
+                f"<html><head><title>Page {index}</title></head><body>"
+                f"<h1>Service page {index}</h1><p>{'lorem ipsum ' * 100}</p>{links}"
+                f"</body></html>"
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return SitePageHandler
+
+
+class Command(BaseCommand):
+    help = "Benchmark sequential vs concurrent (and incremental) crawl against a local stand-in site"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=0.05, help="Server delay per response (s)")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 16, 32])
+
+    def handle(self, *args, **options):
+        pages = options["pages"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(pages, options["latency"]))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        domain = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        try:
+            baseline = None
+            for concurrency in options["concurrency"]:
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    visited = scrape_all_pages(
+                        domain, limit=pages, concurrency=concurrency, per_host=concurrency
+                    )
+                    elapsed = time.perf_counter() - start
+                    transaction.set_rollback(True)
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f"concurrency={concurrency:>3} | {len(visited):>4} pages | "
+                    f"{elapsed:6.2f} s | {baseline / elapsed:5.1f}x"
+                )
+
+            # Incremental recrawl: pehla crawl commit nahi hota, dono ek hi transaction mein
+            concurrency = options["concurrency"][-1]
+            with transaction.atomic():
+                scrape_all_pages(domain, limit=pages, concurrency=concurrency, per_host=concurrency)
+                stats = {}
+                start = time.perf_counter()
+                scrape_all_pages(
+                    domain, limit=pages, concurrency=concurrency, per_host=concurrency, stats=stats
+                )
+                elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"recrawl (concurrency={concurrency}) | {elapsed:6.2f} s | "
+                f"unchanged={stats['unchanged']} written={stats['written']}"
+            )
+        finally:
+            server.shutdown()
@@ -0,0 +1,85 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from bot.conversation import SERVICE_QUESTIONS, WebhookTurn, resolve_state, route
+from bot.views import handle_webhook_turn
+
+SESSION = "projects/bench/agent/sessions/bench"
+
+
+def body(query, intent, contexts=(), parameters=None):
+    return {
+        "session": SESSION,
+        "queryResult": {
+            "queryText": query,
+            "intent": {"displayName": intent},
+            "parameters": parameters or {},
+            "outputContexts": list(contexts),
+        },
+    }
+
+
+def service_context(service, index):
+    return {"name": f"{SESSION}/contexts/{service}-context", "lifespanCount": 20,
+            "parameters": {"service": service, "question_index": index, "answers": {}}}
+
+
+def collect_context(step):
+    return {"name": f"{SESSION}/contexts/collect-details", "lifespanCount": 10,
+            "parameters": {"service": "website", "answers": {}, "name": "Ali", "phone": "03001234567", "step": step}}
+
+
+def turns():
+    """One body per conversation transition except the lead-saving email steps (DB insert, not dispatch)"""
+    for service in SERVICE_QUESTIONS:
+        yield body(f"I need {service}", f"{service}-inquiry")
+        yield body("yes", "service-questions", [service_context(service, 1)])
+        yield body("answer", "Default Fallback Intent", [service_context(service, len(SERVICE_QUESTIONS[service]))])
+    yield body("design please", "website-inquiry", [service_context("design", 2)])
+    yield body("x", "service-questions")
+    yield body("Ali", "collect-contact-details", [collect_context("name")])
+    yield body("03001234567", "collect-contact-details", [collect_context("phone")])
+    yield body("Ali", "Default Fallback Intent", [collect_context("name")])
+    yield body("0300123456789", "Default Fallback Intent", [collect_context("phone")])
+    yield body("mujhe logo chahiye", "Default Fallback Intent")
+    yield body("helpline", "helpline")
+    yield body("what do you do", "LLMQueryIntent")
+    yield body("hmm", "Some Unknown Intent")
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: cost of routing one webhook turn to its handler (bot logging off)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        bodies = list(turns())
+        rounds = options["rounds"]
+        bot_logger = logging.getLogger("bot")
+        saved_level = bot_logger.level
+        bot_logger.setLevel(logging.CRITICAL)   # log cost bench_logging naapta hai
+        try:
+            for b in bodies:
+                handle_webhook_turn(b)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for b in bodies:
+                    handle_webhook_turn(b)
+            elapsed = time.perf_counter() - start
+        finally:
+            bot_logger.setLevel(saved_level)
+        per_turn = elapsed / (rounds * len(bodies)) * 1e6
+
+        # Sirf routing: parse + state resolve + table lookup, handler run nahi hota
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for b in bodies:
+                turn = WebhookTurn(b)
+                kind, step, _, _ = resolve_state(turn)
+                route(turn.intent, kind, step)
+        routing = (time.perf_counter() - start) / (rounds * len(bodies)) * 1e6
+
+        self.stdout.write(f"{len(bodies)} transitions x {rounds} rounds")
+        self.stdout.write(f"full turn (parse, route, handler, JsonResponse) {per_turn:6.1f} us/turn")
+        self.stdout.write(f"routing only (parse + resolve + table lookup) {routing:6.2f} us/turn")
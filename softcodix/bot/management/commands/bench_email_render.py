@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from bot.emails import COMPANY_TEMPLATE, USER_TEMPLATE, build_lead_messages, compiled_email, lead_context, render_email
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: lead email render time per lead (templates compiled once per process)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--leads", type=int, default=2000)
+        parser.add_argument("--answers", type=int, default=5, help="Q&A pairs per lead")
+
+    def per_lead_us(self, fn, leads):
+        start = time.perf_counter()
+        for _ in range(leads):
+            fn()
+        return (time.perf_counter() - start) / leads * 1e6
+
+    def handle(self, *args, **options):
+        leads = options["leads"]
+        answers = {f"Question {i}?": f"Answer {i} with <b>markup</b> & more" for i in range(options["answers"])}
+        context = lead_context("mobile-app", "Bench <Lead>", "03001234567", "lead@example.com", answers)
+
+        compiled_email.cache_clear()
+        start = time.perf_counter()
+        render_email(COMPANY_TEMPLATE, context)
+        render_email(USER_TEMPLATE, context)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        def render_both():
+            render_email(COMPANY_TEMPLATE, context)
+            render_email(USER_TEMPLATE, context)
+
+        def build_and_serialize():
+            for message in build_lead_messages(context):
+                message.message()
+
+        with override_settings(LEAD_EMAIL="leads@example.com", DEFAULT_FROM_EMAIL="bot@example.com"):
+            render_us = self.per_lead_us(render_both, leads)
+            build_us = self.per_lead_us(build_and_serialize, leads)
+
+        self.stdout.write(f"{leads} leads, {options['answers']} answers each")
+        self.stdout.write(f"first render (load + compile)   {cold_ms:8.2f} ms")
+        self.stdout.write(f"render, both emails             {render_us:8.1f} us/lead")
+        self.stdout.write(f"render + build + MIME serialize {build_us:8.1f} us/lead")
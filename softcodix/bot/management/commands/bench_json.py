@@ -0,0 +1,77 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse, JsonResponse
+from bot.conversation import HELPLINE, HELPLINE_RESPONSE, SERVICE_QUESTIONS, service_context
+from bot.jsoncodec import CODECS, JSON_CONTENT_TYPE, raw_response
+
+SESSION = "projects/bench/agent/sessions/bench"
+
+
+def request_bytes():
+    """A realistic Dialogflow request: Roman Urdu text, entities and two active contexts"""
+    contexts = [
+        service_context(SESSION, "mobile-app", 3, {q: "jawab ✨" for q in SERVICE_QUESTIONS["mobile-app"][:2]}),
+        {"name": f"{SESSION}/contexts/__system_counters__", "lifespanCount": 1,
+         "parameters": {"no-input": 0.0, "no-match": 1.0}},
+    ]
+    return json.dumps({
+        "responseId": "b7c0f2a4-1e55-4bbf-9d0e-bench",
+        "session": SESSION,
+        "queryResult": {
+            "queryText": "hamein 5000 users expect hain",
+            "parameters": {"number": 5000.0, "person": {"name": ""}},
+            "allRequiredParamsPresent": True,
+            "outputContexts": contexts,
+            "intent": {"name": "projects/bench/agent/intents/1", "displayName": "Default Fallback Intent"},
+            "intentDetectionConfidence": 1.0,
+            "languageCode": "en",
+        },
+        "originalDetectIntentRequest": {"source": "DIALOGFLOW_CONSOLE", "payload": {}},
+    }).encode()
+
+
+def reply_data():
+    return {
+        "fulfillmentText": SERVICE_QUESTIONS["mobile-app"][3],
+        "outputContexts": [service_context(SESSION, "mobile-app", 4, {q: "jawab ✨" for q in SERVICE_QUESTIONS["mobile-app"][:3]})],
+    }
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: JSON parse + render cost per webhook request, per codec"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20000)
+
+    def per_call_us(self, fn, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - start) / rounds * 1e6
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        raw, data = request_bytes(), reply_data()
+
+        # Purana tareeqa: decode + json.loads, phir JsonResponse (DjangoJSONEncoder)
+        rows = [(
+            "decode + json.loads / JsonResponse",
+            self.per_call_us(lambda: json.loads(raw.decode("utf-8")), rounds),
+            self.per_call_us(lambda: JsonResponse(data), rounds),
+            self.per_call_us(lambda: JsonResponse(HELPLINE_RESPONSE), rounds),
+        )]
+        for name, codec in CODECS.items():
+            rows.append((
+                f"{name} codec (bytes in, bytes out)",
+                self.per_call_us(lambda: codec.loads(raw), rounds),
+                self.per_call_us(lambda: HttpResponse(codec.dumps(data), content_type=JSON_CONTENT_TYPE), rounds),
+                self.per_call_us(lambda: raw_response(codec.dumps(HELPLINE_RESPONSE)), rounds),
+            ))
+        static = self.per_call_us(HELPLINE, rounds)
+
+        self.stdout.write(f"request {len(raw)} bytes, {rounds} rounds (us per call)")
+        self.stdout.write(f"{'':38} {'parse':>7} {'reply':>7} {'helpline':>9} {'total':>7}")
+        for label, parse, render, helpline in rows:
+            self.stdout.write(f"{label:38} {parse:7.2f} {render:7.2f} {helpline:9.2f} {parse + render:7.2f}")
+        self.stdout.write(f"{'pre-serialized helpline (StaticResponse)':48} {static:9.2f}")
@@ -0,0 +1,67 @@
+import random
+import re
+import time
+from django.core.management.base import BaseCommand
+from bot.conversation import SERVICE_KEYWORDS, KeywordMatcher
+
+QUERIES = [
+    "mujhe apne business ke liye website chahiye",
+    "can you build a guide for my team",
+    "I want an android app with payments",
+    "facebook ads aur seo dono chahiye",
+    "hamein whatsapp bot banwana hai",
+    "logo aur branding ka kaam",
+    "what are your office timings",
+    "price kya hai aapki services ki",
+]
+
+
+def substring_detect(service_keywords, query):
+    """The old detector: first keyword found anywhere in the lowercased query"""
+    query_lower = query.lower()
+    for service, keywords in service_keywords.items():
+        for keyword in keywords:
+            if keyword in query_lower:
+                return service
+    return None
+
+
+def synonym_table(extra):
+    """SERVICE_KEYWORDS padded with `extra` made-up Roman Urdu style synonyms spread over the services"""
+    rng = random.Random(7)
+    table = {service: list(keywords) for service, keywords in SERVICE_KEYWORDS.items()}
+    services = list(table)
+    for i in range(extra):
+        word = "".join(rng.choice("abcdefghijklmnoprstuwyz") for _ in range(rng.randint(5, 10)))
+        table[services[i % len(services)]].append(word if i % 4 else f"{word} {i}")
+    return table
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: service keyword detection per query as the synonym list grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=500)
+        parser.add_argument("--sizes", default="0,1000,5000", help="extra synonyms per run, comma separated")
+
+    def per_query_us(self, fn, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for query in QUERIES:
+                fn(query)
+        return (time.perf_counter() - start) / (rounds * len(QUERIES)) * 1e6
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        self.stdout.write(f"{'synonyms':>9} {'substring':>10} {'regex':>10} {'matcher':>10}  (us/query)")
+        for extra in map(int, options["sizes"].split(",")):
+            table = synonym_table(extra)
+            keywords = sorted((k for ks in table.values() for k in ks), key=len, reverse=True)
+            # Ek bada \b(...)\b regex - comparison ke liye, matcher ke bajaye
+            regex = re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b")
+            matcher = KeywordMatcher(table)
+
+            substring = self.per_query_us(lambda q: substring_detect(table, q), rounds)
+            alternation = self.per_query_us(lambda q: regex.findall(q.lower()), rounds)
+            compiled = self.per_query_us(matcher.best, rounds)
+            self.stdout.write(f"{len(keywords):>9} {substring:>10.1f} {alternation:>10.1f} {compiled:>10.1f}")
@@ -0,0 +1,49 @@
+import concurrent.futures
+import time
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from bot.fakes import FakeGeminiServer
+from bot.llm_client import client_stats
+from bot.views import query_gemini_softcodix, query_with_timeout_softcodix
+
+
+def old_query(url, prompt, timeout=4):
+    """Pehle wala path: naya executor + bare requests.post har call par"""
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        future = executor.submit(
+            requests.post, url, json={"contents": [{"parts": [{"text": prompt}]}]}, timeout=timeout
+        )
+        return future.result(timeout=timeout).json()
+
+
+class Command(BaseCommand):
+    help = "Compare per-call connections/executors vs the pooled Gemini client against a local fake Gemini"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=300)
+        parser.add_argument("--latency", type=float, default=0.002)
+
+    def measure(self, label, fn, calls, fake):
+        connections_before = fake.connections
+        timings = []
+        for i in range(calls):
+            start = time.perf_counter()
+            fn(i)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p95 = np.percentile(timings, [50, 95])
+        self.stdout.write(
+            f"{label:<28} p50 {p50:6.2f} ms | p95 {p95:6.2f} ms | "
+            f"new connections {fake.connections - connections_before}"
+        )
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        with FakeGeminiServer(latency=options["latency"]) as fake:
+            url = f"{fake.base_url}/models/fake:generateContent?key=test"
+            with override_settings(GEMINI_API_BASE=fake.base_url, GEMINI_API_KEY="test"):
+                self.measure("per-call post + executor", lambda i: old_query(url, f"q{i}"), calls, fake)
+                self.measure("pooled session + executor", lambda i: query_with_timeout_softcodix(f"q{i}", "", ""), calls, fake)
+                self.measure("pooled session (direct)", lambda i: query_gemini_softcodix(f"q{i}", "", ""), calls, fake)
+            self.stdout.write(f"client stats: {client_stats()}")
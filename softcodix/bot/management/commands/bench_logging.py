@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from bot.logs import BackgroundQueueHandler, SampleDebugFilter, StructuredFormatter
+from bot.views import handle_webhook_turn
+from .bench_dispatch import turns
+
+
+def pipe_sink():
+    """Write end of a pipe drained by a reader thread - like stdout under gunicorn/systemd"""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        while os.read(read_fd, 65536):
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1, encoding="utf-8")
+
+
+def sync_handler(stream):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter())
+    return handler
+
+
+def sampled_queue_handler(stream):
+    handler = BackgroundQueueHandler(stream=stream)
+    handler.addFilter(SampleDebugFilter(rate=0.1))
+    return handler
+
+
+SCENARIOS = [
+    # (label, logger level, handler factory)
+    ("sync StreamHandler, DEBUG", logging.DEBUG, sync_handler),
+    ("queue handler, DEBUG", logging.DEBUG, lambda stream: BackgroundQueueHandler(stream=stream)),
+    ("queue handler, DEBUG sampled 10%", logging.DEBUG, sampled_queue_handler),
+    ("queue handler, INFO (production)", logging.INFO, lambda stream: BackgroundQueueHandler(stream=stream)),
+    ("logging off (reference)", logging.CRITICAL, lambda stream: logging.NullHandler()),
+]
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: per-turn logging cost on the request thread (conversation turns, output to a pipe)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=400)
+        parser.add_argument("--threads", type=int, default=8, help="concurrent request threads")
+
+    def run_turns(self, bodies, rounds, threads):
+        def worker():
+            for _ in range(rounds):
+                for body in bodies:
+                    handle_webhook_turn(body)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            for future in [pool.submit(worker) for _ in range(threads)]:
+                future.result()
+        return (time.perf_counter() - start) / (rounds * len(bodies) * threads) * 1e6
+
+    def handle(self, *args, **options):
+        bodies = list(turns())
+        rounds, threads = options["rounds"], options["threads"]
+        bot_logger = logging.getLogger("bot")
+        saved_handlers, saved_level = bot_logger.handlers[:], bot_logger.level
+        stream = pipe_sink()
+
+        self.stdout.write(f"{len(bodies)} turns x {rounds} rounds x {threads} threads (us per turn, wall clock)")
+        try:
+            for label, level, make_handler in SCENARIOS:
+                handler = make_handler(stream)
+                bot_logger.handlers = [handler]
+                bot_logger.setLevel(level)
+                self.run_turns(bodies, 10, threads)   # warm-up
+                per_turn = self.run_turns(bodies, rounds, threads)
+                handler.close()
+                self.stdout.write(f"{label:36} {per_turn:8.1f}")
+        finally:
+            bot_logger.handlers = saved_handlers
+            bot_logger.setLevel(saved_level)
+            stream.close()
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import time
+import numpy as np
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from bot.fakes import FakeSMTPServer
+from bot.mailer import ReusableConnection
+from bot.views import send_lead_email
+
+LEAD = {
+    "service": "website",
+    "name": "Bench Lead",
+    "phone": "03001234567",
+    "email": "lead@example.com",
+    "answers": {"What type of website do you need?": "E-commerce", "What is your budget range?": "200k"},
+}
+
+
+class PerMessageConnection:
+    """Pehle wala behaviour: har msg.send() apna connection kholta hai"""
+
+    def send_messages(self, messages):
+        return sum(get_connection().send_messages([message]) for message in messages)
+
+
+class Command(BaseCommand):
+    help = "Lead email delivery against a local SMTP stand-in: connections opened and time per lead"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--leads", type=int, default=100)
+        parser.add_argument("--handshake", type=float, default=0.05, help="Simulated connect + TLS + login seconds")
+        parser.add_argument("--rtt", type=float, default=0.002, help="Simulated round trip per SMTP command")
+        parser.add_argument("--window", type=float, default=30, help="Connection reuse window (seconds)")
+
+    def measure(self, label, connection_for, leads, fake):
+        connections, messages = fake.connections, fake.messages
+        timings = []
+        for _ in range(leads):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                sent = send_lead_email(LEAD, raise_errors=True, connection=connection_for())
+            timings.append((time.perf_counter() - start) * 1000)
+            assert sent
+        p50, p95 = np.percentile(timings, [50, 95])
+        self.stdout.write(
+            f"{label:<28} {np.mean(timings):7.2f} ms/lead (p50 {p50:6.2f}, p95 {p95:6.2f}) | "
+            f"connections {fake.connections - connections:4} | messages {fake.messages - messages}"
+        )
+
+    def handle(self, *args, **options):
+        leads = options["leads"]
+        with FakeSMTPServer(handshake_latency=options["handshake"], rtt=options["rtt"]) as fake, override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=fake.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="bench",
+            EMAIL_HOST_PASSWORD="bench",
+            DEFAULT_FROM_EMAIL="bot@example.com",
+            LEAD_EMAIL="leads@example.com",
+        ):
+            self.stdout.write(
+                f"{leads} leads, 2 emails each | handshake {options['handshake'] * 1000:.0f} ms, "
+                f"rtt {options['rtt'] * 1000:.0f} ms"
+            )
+            per_message = PerMessageConnection()
+            self.measure("connection per message", lambda: per_message, leads, fake)
+            self.measure("connection per lead", lambda: None, leads, fake)
+            reusable = ReusableConnection(window=options["window"])
+            self.measure(f"reused ({options['window']:g} s window)", reusable.get, leads, fake)
+            reusable.close()
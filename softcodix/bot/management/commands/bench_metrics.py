@@ -0,0 +1,49 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from bot.metrics import Metrics
+
+INTENTS = ["website-inquiry", "service-questions", "collect-contact-details", "Default Fallback Intent", "LLMQueryIntent"]
+STAGES = ["parse", "dispatch", "db_lookup", "retrieval", "gemini", "smtp", "total"]
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: cost of recording stage latencies / counters and of rendering /metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=200000)
+
+    def per_call_us(self, fn, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - start) / rounds * 1e6
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        metrics = Metrics()
+
+        def timed_block():
+            with metrics.timer("dispatch", "website-inquiry"):
+                pass
+
+        baseline = self.per_call_us(lambda: None, rounds)
+        rows = [
+            ("observe(stage, seconds, intent)", self.per_call_us(lambda: metrics.observe("parse", 0.0004, "helpline"), rounds)),
+            ("with timer(stage, intent): pass", self.per_call_us(timed_block, rounds)),
+            ("incr(counter, **labels)", self.per_call_us(
+                lambda: metrics.incr("bot_cache_lookups_total", cache="response", result="hit"), rounds)),
+        ]
+
+        # Realistic registry: every stage x intent, spread over the buckets
+        rng = random.Random(3)
+        for _ in range(20000):
+            metrics.observe(rng.choice(STAGES), rng.lognormvariate(-4, 1.5), rng.choice(INTENTS))
+        start = time.perf_counter()
+        text = metrics.render()
+        render_ms = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(f"{'call':34} {'us/call':>8}  (loop overhead {baseline:.2f} us subtracted)")
+        for label, us in rows:
+            self.stdout.write(f"{label:34} {us - baseline:8.2f}")
+        self.stdout.write(f"render {len(STAGES) * len(INTENTS)} histograms: {render_ms:.1f} ms, {len(text) // 1024} KiB")
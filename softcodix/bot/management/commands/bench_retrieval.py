@@ -0,0 +1,55 @@
+import random
+import tempfile
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from bot.retrieval import VectorIndex, build_index
+
+WORDS = (
+    "website mobile app marketing chatbot design logo seo ads branding cloud "
+    "api automation ecommerce portfolio blog android ios whatsapp facebook "
+    "instagram google tiktok budget pages users payment support lead ai"
+).split()
+
+QUERIES = [
+    "website development price",
+    "whatsapp chatbot for customer support",
+    "seo aur google ads",
+    "logo design budget",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark vector top-k lookup on synthetic passages (index built in a temp dir)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--passages", type=int, nargs="+", default=[10000, 50000])
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        vocab = ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(20000)]
+
+        for size in options["passages"]:
+            rows = (
+                (i, " ".join(rng.choices(vocab, k=85) + rng.choices(WORDS, k=5)))
+                for i in range(size)
+            )
+            with tempfile.TemporaryDirectory() as path:
+                start = time.perf_counter()
+                build_index(rows, path=path)
+                build_s = time.perf_counter() - start
+
+                index = VectorIndex(path)
+                timings = []
+                for _ in range(options["repeat"]):
+                    for q in QUERIES:
+                        start = time.perf_counter()
+                        index.top_k(q, k=4)
+                        timings.append((time.perf_counter() - start) * 1000)
+                p50, p95 = np.percentile(timings, [50, 95])
+                self.stdout.write(
+                    f"{size:>7} passages x {index.dim} dims ({index.vectors.nbytes / 2**20:.0f} MiB) | "
+                    f"build {build_s:5.1f} s | top-4 p50 {p50:.2f} ms p95 {p95:.2f} ms"
+                )
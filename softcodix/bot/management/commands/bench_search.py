@@ -0,0 +1,85 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bot.models import PageContent
+from bot.search import rebuild_index, search_pages
+
+WORDS = (
+    "website mobile app marketing chatbot design logo seo ads branding cloud "
+    "api automation ecommerce portfolio blog android ios whatsapp facebook "
+    "instagram google tiktok budget pages users payment support lead ai "
+    "custom development hosting domain maintenance analytics strategy"
+).split()
+
+QUERIES = [
+    "website development price",
+    "do you make whatsapp chatbot",
+    "seo and google ads",
+    "logo design budget",
+    "Softcodix is an IT solutions company",
+]
+
+
+def filler_vocab(rng, size=20000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(size)]
+
+
+def fake_page(i, rng, vocab):
+    # Mostly filler text with a few real service words, like a scraped page
+    words = rng.choices(vocab, k=290) + rng.choices(WORDS, k=10)
+    rng.shuffle(words)
+    return PageContent(
+        url=f"https://bench.local/page-{i}",
+        page=f"page-{i}",
+        title=" ".join(rng.choices(WORDS, k=3)),
+        content=" ".join(words),
+    )
+
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark FTS5 search vs the old icontains lookup (runs in a rolled back transaction)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        vocab = filler_vocab(rng)
+        repeat = options["repeat"]
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                PageContent.objects.bulk_create(
+                    (fake_page(i, rng, vocab) for i in range(size)), batch_size=2000
+                )
+                rebuild_index()
+
+                icontains_ms, fts_ms = [], []
+                for q in QUERIES:
+                    def old_path():
+                        db_result = PageContent.objects.filter(content__icontains=q)
+                        if db_result.exists():
+                            db_result.first().content[:400]
+
+                    icontains_ms.append(time_it(old_path, repeat))
+                    fts_ms.append(time_it(lambda: search_pages(q, limit=3), repeat))
+
+                self.stdout.write(
+                    f"{size:>7} pages | icontains: {sum(icontains_ms) / len(QUERIES):8.2f} ms/query"
+                    f" | fts5 bm25 top-3: {sum(fts_ms) / len(QUERIES):8.2f} ms/query"
+                )
+                transaction.set_rollback(True)
+
+            rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS("Benchmark done (synthetic pages rolled back)"))
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from bot.models import PageContent
+from bot.web_scrap import PageBuffer
+
+PREFIX = "https://bench.local/upsert-"
+
+
+def page_fields(i, rnd):
+    return {
+        "content": f"round {rnd} page {i} " + "lorem ipsum dolor " * 100,
+        "etag": f'"{rnd}-{i}"',
+        "content_hash": f"{rnd:032x}{i:032x}",
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-page update_or_create vs batched bulk upsert (bench rows are deleted afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, nargs="+", default=[10, 50, 200])
+
+    def run_round(self, label, write, pages):
+        # Round 1 inserts, round 2 updates existing rows (like a recrawl)
+        for rnd in (1, 2):
+            start = time.perf_counter()
+            write(rnd)
+            elapsed = time.perf_counter() - start
+            kind = "insert" if rnd == 1 else "update"
+            self.stdout.write(f"{label:<22} {kind} | {elapsed * 1000 / pages:7.3f} ms/page")
+        PageContent.objects.filter(url__startswith=PREFIX).delete()
+
+    def handle(self, *args, **options):
+        pages = options["pages"]
+
+        def one_by_one(rnd):
+            for i in range(pages):
+                PageContent.objects.update_or_create(url=f"{PREFIX}{i}", defaults=page_fields(i, rnd))
+
+        try:
+            self.run_round("update_or_create", one_by_one, pages)
+
+            for batch_size in options["batch_size"]:
+                def batched(rnd):
+                    buffer = PageBuffer(batch_size)
+                    for i in range(pages):
+                        buffer.add(f"{PREFIX}{i}", **page_fields(i, rnd))
+                    buffer.flush()
+
+                self.run_round(f"bulk batch={batch_size}", batched, pages)
+        finally:
+            PageContent.objects.filter(url__startswith=PREFIX).delete()
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from bot.retrieval import build_passage_index, index_dir
+
+
+class Command(BaseCommand):
+    help = "Build the memory-mapped passage vector index used for the Gemini prompt context"
+
+    def handle(self, *args, **options):
+        count = build_passage_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} passages into {index_dir()}"))
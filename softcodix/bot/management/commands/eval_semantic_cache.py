@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from bot.semantic_cache import SemanticCache
+
+DEFAULT_LOG = Path(__file__).resolve().parents[2] / "data" / "query_log_sample.jsonl"
+
+
+def replay(queries, threshold):
+    """Replay a labelled log: a hit is 'false' when the served answer belongs to another group"""
+    cache = SemanticCache(threshold=threshold, maxsize=len(queries) + 1, ttl=3600)
+    hits = false_hits = 0
+    for row in queries:
+        answer, _ = cache.lookup(row["query"])
+        if answer is None:
+            # Miss -> Gemini call hota, uska answer cache mein daal do
+            cache.add(row["query"], row["group"])
+        else:
+            hits += 1
+            if answer != row["group"]:
+                false_hits += 1
+    return hits, false_hits
+
+
+class Command(BaseCommand):
+    help = "Offline eval of the semantic query cache: hit rate and false-hit rate on a replayed query log"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=str(DEFAULT_LOG), help='JSONL with {"query": ..., "group": ...} per line')
+        parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9])
+
+    def handle(self, *args, **options):
+        with open(options["log"], encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+
+        # Upper bound: har group ki pehli query ke baad sab hits ho sakti hain
+        possible = len(queries) - len({row["group"] for row in queries})
+        self.stdout.write(f"{len(queries)} queries, {possible} answerable from cache at best")
+
+        for threshold in options["thresholds"]:
+            hits, false_hits = replay(queries, threshold)
+            false_rate = false_hits / hits if hits else 0.0
+            self.stdout.write(
+                f"threshold {threshold:.2f} | hit rate {hits / len(queries):6.1%} "
+                f"({hits}/{len(queries)}) | false-hit rate {false_rate:6.1%} ({false_hits}/{hits})"
+            )
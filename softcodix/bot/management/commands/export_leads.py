@@ -0,0 +1,36 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from bot.leads import EXPORT_FORMATS, export_lines
+from bot.models import Lead
+
+
+class Command(BaseCommand):
+    help = "Stream leads (with answers) to CSV or JSONL in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", default="-", help="File path, '-' for stdout")
+        parser.add_argument("--service", default=None, help="Only this service (e.g. website)")
+        parser.add_argument("--since", default=None, help="Only leads created on/after this date (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per query")
+
+    def handle(self, *args, **options):
+        leads = Lead.objects.all()
+        if options["service"]:
+            leads = leads.filter(service=options["service"])
+        if options["since"]:
+            leads = leads.filter(created_at__date__gte=datetime.strptime(options["since"], "%Y-%m-%d").date())
+
+        lines = export_lines(options["format"], leads, options["chunk_size"])
+        if options["output"] == "-":
+            for line in lines:   # self.stdout, taake call_command(stdout=...) capture kar sake
+                self.stdout.write(line, ending="")
+            return
+        count = 0
+        with open(options["output"], "w", encoding="utf-8", newline="") as out:
+            for line in lines:
+                out.write(line)
+                count += 1
+        if options["format"] == "csv":
+            count -= 1   # header row
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} leads to {options['output']}"))
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from bot import llm_client
+from bot.conversation import SERVICE_QUESTIONS
+from bot.fakes import FakeSMTPServer, LatencyDistribution, fake_gemini_process
+from bot.jsoncodec import dumps, loads
+from bot.llm_cache import get_response_cache
+from bot.metrics import METRICS
+from bot.models import Lead
+from bot.outbox import drain
+from bot.replay import bot_log_level
+from bot.semantic_cache import get_semantic_cache
+from bot.views import BUSY_REPLY, HOLDING_REPLY, dialogflow_webhook, dialogflow_webhook_async
+from .bench_async import ThreadSampler
+
+SERVICE = "website"
+LLM_QUESTIONS = ["website ki price kitni hogi?", "kitne din mein ban jayegi?", "hosting bhi aap dete ho?"]
+
+
+def request_body(session, query, intent, contexts, parameters=None):
+    return dumps({
+        "session": session,
+        "queryResult": {
+            "queryText": query,
+            "intent": {"displayName": intent},
+            "parameters": parameters or {},
+            "outputContexts": contexts,
+        },
+    })
+
+
+def conversation_script(i, llm_turns):
+    """(kind, query, intent, parameters) from the service inquiry to a submitted lead"""
+    yield "flow", "mujhe apne business ke liye website chahiye", f"{SERVICE}-inquiry", None
+    for n in range(llm_turns):
+        # Conversation id query mein - har LLM turn cache miss, yaani Gemini tak jata hai
+        yield "llm", f"{LLM_QUESTIONS[n % len(LLM_QUESTIONS)]} ({i})", "LLMQueryIntent", None
+    for answer in ("E-commerce", "15 pages", "1 lakh tak")[:len(SERVICE_QUESTIONS[SERVICE])]:
+        yield "flow", answer, "service-questions", None
+    yield "flow", "Load Tester", "collect-contact-details", {"person": {"name": "Load Tester"}}
+    yield "flow", "03001234567", "collect-contact-details", {"phone-number": "03001234567"}
+    yield "flow", f"load{i}@example.com", "collect-contact-details", None
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end load test: N concurrent multi-turn conversations (inquiry -> lead) against fake "
+        "Gemini + SMTP servers, for the sync (WSGI threads) and async (ASGI) webhook or a deployed --url"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conversations", default="50,200,500", help="concurrency levels, comma separated")
+        parser.add_argument("--mode", default="sync,async", help="sync, async, or both (comma separated)")
+        parser.add_argument("--threads", type=int, default=16, help="sync worker threads (gunicorn --threads)")
+        parser.add_argument("--llm-turns", type=int, default=1, help="LLM questions per conversation")
+        parser.add_argument("--gemini-latency", default="lognormal:0.8,0.5",
+                            help='"fixed:S", "uniform:A,B" or "lognormal:MEDIAN,SIGMA" seconds')
+        parser.add_argument("--error-rate", type=float, default=0.02, help="fake Gemini HTTP 500 share")
+        parser.add_argument("--smtp-latency", type=float, default=0.05, help="fake SMTP handshake seconds")
+        parser.add_argument("--semantic-cache", action="store_true",
+                            help="let similar LLM questions hit the semantic cache (default: every one reaches Gemini)")
+        parser.add_argument("--url", help="drive a deployed webhook (e.g. http://127.0.0.1:8000/webhook/) instead")
+
+    # --- Transports: body bytes -> (status, reply dict) ---------------------------
+
+    def sync_transport(self, threads):
+        factory, pool = RequestFactory(), ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+        def call(body):
+            response = dialogflow_webhook(factory.post("/webhook/", body, content_type="application/json"))
+            return response.status_code, loads(response.content)
+
+        async def send(body):
+            # Free worker thread ka intezar bhi latency mein - asli server ki tarah
+            return await asyncio.get_running_loop().run_in_executor(pool, call, body)
+
+        return send, pool.shutdown
+
+    def async_transport(self):
+        factory = AsyncRequestFactory()
+
+        async def send(body):
+            response = await dialogflow_webhook_async(
+                factory.post("/webhook-async/", body, content_type="application/json")
+            )
+            return response.status_code, loads(response.content)
+
+        return send, lambda: None
+
+    def http_transport(self, url, conversations):
+        client = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=conversations))
+
+        async def send(body):
+            response = await client.post(url, content=body, headers={"Content-Type": "application/json"})
+            return response.status_code, response.json() if response.status_code == 200 else {}
+
+        return send, client.aclose
+
+    # --- Load ----------------------------------------------------------------------
+
+    async def conversation(self, send, i, run, llm_turns, results):
+        session, contexts = f"projects/load/agent/sessions/{run}-{i}", []
+        for kind, query, intent, parameters in conversation_script(i, llm_turns):
+            start = time.perf_counter()
+            try:
+                status, data = await send(request_body(session, query, intent, contexts, parameters))
+            except Exception as e:
+                status, data = 0, {"fulfillmentText": f"client error: {e}"}
+            reply = data.get("fulfillmentText", "")
+            results.append((kind, time.perf_counter() - start, status, reply))
+            # Dialogflow ki tarah: response ke contexts agle request mein wapas aate hain
+            contexts = data.get("outputContexts", contexts)
+            if status != 200:
+                return False
+        return reply.startswith("Perfect! ✅")
+
+    def run_level(self, send, close, n, run, llm_turns):
+        results = []
+
+        async def main():
+            try:
+                return await asyncio.gather(*(self.conversation(send, i, run, llm_turns, results) for i in range(n)))
+            finally:
+                outcome = close()
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+
+        with ThreadSampler() as sampler:
+            start = time.perf_counter()
+            completed = asyncio.run(main())
+            wall = time.perf_counter() - start
+        return results, sum(completed), wall, sampler.peak
+
+    def report(self, label, n, results, leads, wall, peak_threads, emails, server=""):
+        latencies = [latency for _, latency, _, _ in results]
+        llm = [(latency, reply) for kind, latency, _, reply in results if kind == "llm"]
+        timeouts = sum(1 for _, reply in llm if reply in (BUSY_REPLY, HOLDING_REPLY))
+        failed = sum(1 for _, _, status, _ in results if status != 200)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        llm_p99 = np.percentile([latency for latency, _ in llm], 99) * 1000 if llm else 0.0
+        self.stdout.write(
+            f"{label:<6} {n:>5} | {len(results) / wall:6.1f} turns/s | p50 {p50:6.0f} p95 {p95:6.0f} "
+            f"p99 {p99:6.0f} ms | LLM p99 {llm_p99:6.0f} ms | timeouts {timeouts / max(len(llm), 1):6.1%} "
+            f"| http err {failed:>3} | leads {leads:>4}/{n} | emails {emails:>4} | threads {peak_threads}{server}"
+        )
+
+    def handle(self, *args, **options):
+        levels = [int(n) for n in options["conversations"].split(",")]
+        modes = [mode.strip() for mode in options["mode"].split(",")]
+        latency = LatencyDistribution(options["gemini_latency"])
+
+        with fake_gemini_process(latency=latency, error_rate=options["error_rate"], seed=7) as gemini_url, \
+                FakeSMTPServer(handshake_latency=options["smtp_latency"]) as smtp:
+            self.stdout.write(
+                f"fake Gemini {gemini_url} latency {latency!r} error rate {options['error_rate']:.0%}; "
+                f"fake SMTP 127.0.0.1:{smtp.port}; {options['llm_turns']} LLM turn(s) per conversation"
+            )
+            if options["url"]:
+                self.run_remote(options, levels, gemini_url, smtp)
+            else:
+                self.run_local(options, levels, modes, gemini_url, smtp)
+
+    def run_remote(self, options, levels, gemini_url, smtp):
+        self.stdout.write(
+            "Start the deployment with these settings overrides (fake servers stay up until the run ends):\n"
+            f"  GEMINI_API_BASE={gemini_url} GEMINI_API_KEY=load EMAIL_HOST=127.0.0.1 "
+            f"EMAIL_PORT={smtp.port} EMAIL_USE_TLS=0\n"
+            "Run `manage.py process_outbox` there too if leads should reach the SMTP sink."
+        )
+        for n in levels:
+            send, close = self.http_transport(options["url"], n)
+            results, leads, wall, _ = self.run_level(send, close, n, f"http{n}-{os.getpid()}", options["llm_turns"])
+            self.report("http", n, results, leads, wall, "n/a (remote)", smtp.messages)
+
+    def run_local(self, options, levels, modes, gemini_url, smtp):
+        # Asli db.sqlite3 ko haath nahi lagana - alag temporary test database
+        with tempfile.TemporaryDirectory() as tmp:
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmp, "load.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(
+                    GEMINI_API_BASE=gemini_url,
+                    GEMINI_API_KEY="load",
+                    RETRIEVAL_INDEX_DIR=os.path.join(tmp, "index"),
+                    EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+                    EMAIL_HOST="127.0.0.1",
+                    EMAIL_PORT=smtp.port,
+                    EMAIL_USE_TLS=False,
+                    OUTBOX_POLL_INTERVAL=0.2,
+                ), bot_log_level(logging.WARNING):
+                    for mode in modes:
+                        for n in levels:
+                            self.run_local_level(options, mode, n, smtp)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def server_side(self, locked):
+        """Counters only the in-process run can see: Gemini calls / errors and SQLite lock waits"""
+        gemini = METRICS.histogram("gemini")
+        errors = sum(value for (name, _), value in METRICS.counters.items() if name == "bot_gemini_errors_total")
+        return (f" | gemini calls {gemini.count if gemini else 0} err {errors} "
+                f"timeouts {METRICS.value('bot_gemini_timeouts_total')} | outbox locked {locked}")
+
+    def run_local_level(self, options, mode, n, smtp):
+        llm_client.shutdown()   # executor / pools fresh for every run
+        get_response_cache().clear()
+        semantic = get_semantic_cache()
+        semantic.clear()
+        threshold = semantic.threshold
+        if not options["semantic_cache"]:
+            semantic.threshold = 1.01   # cosine kabhi 1 se upar nahi - koi semantic hit nahi
+        METRICS.reset()
+        sent_before, leads_before = smtp.messages, Lead.objects.count()
+        stop, locked = threading.Event(), []
+
+        def outbox_worker():
+            # process_outbox jaisa worker, saath saath chalta hai
+            while not stop.is_set():
+                try:
+                    drain(once=True)
+                except OperationalError:   # SQLite "database is locked" - agle chakkar mein phir
+                    locked.append(1)
+                stop.wait(0.2)
+
+        worker = threading.Thread(target=outbox_worker, daemon=True)
+        worker.start()
+        try:
+            send, close = self.sync_transport(options["threads"]) if mode == "sync" else self.async_transport()
+            results, leads, wall, peak_threads = self.run_level(send, close, n, f"{mode}{n}", options["llm_turns"])
+        finally:
+            stop.set()
+            worker.join()
+            semantic.threshold = threshold
+            llm_client.shutdown()
+        drain(once=True)
+        saved = Lead.objects.count() - leads_before
+        if saved < leads:
+            raise CommandError(f"{mode} {n}: {leads} conversations confirmed a lead but only {saved} were saved")
+        self.report(mode, n, results, leads, wall, peak_threads, smtp.messages - sent_before,
+                    self.server_side(len(locked)))
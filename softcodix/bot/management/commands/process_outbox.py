@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from bot.outbox import drain, queue_stats
+
+
+class Command(BaseCommand):
+    help = "Send queued lead emails from the outbox (retries with backoff, dead-letters after max attempts)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None, help="Emails in flight (default: OUTBOX_CONCURRENCY)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows claimed per batch (default: OUTBOX_BATCH_SIZE)")
+        parser.add_argument("--poll", type=float, default=None, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--max-attempts", type=int, default=None, help="Dead-letter after this many failures")
+        parser.add_argument("--once", action="store_true", help="Drain what is due now, then exit (cron mode)")
+        parser.add_argument("--stats", action="store_true", help="Only print queue depth / throughput and exit")
+
+    def print_stats(self):
+        stats = queue_stats()
+        self.stdout.write(
+            f"pending {stats['pending']} | sending {stats['sending']} | sent {stats['sent']} "
+            f"| dead {stats['dead']} | oldest open {stats['oldest_open_age_s']:.0f} s "
+            f"| sent last hour {stats['sent_last_hour']}"
+        )
+
+    def report(self, counts, elapsed):
+        handled = sum(counts.values())
+        self.stdout.write(
+            f"batch of {handled}: sent {counts['sent']}, retry {counts['pending']}, dead {counts['dead']} "
+            f"in {elapsed:.2f} s ({handled / elapsed if elapsed else 0:.1f}/s)"
+        )
+
+    def handle(self, *args, **options):
+        self.print_stats()
+        if options["stats"]:
+            return
+        try:
+            totals = drain(
+                concurrency=options["concurrency"],
+                batch_size=options["batch_size"],
+                once=options["once"],
+                poll_interval=options["poll"],
+                max_attempts=options["max_attempts"],
+                report=self.report,
+            )
+        except KeyboardInterrupt:
+            # Leased rows khud expire ho kar dobara pending ban jayengi
+            self.stdout.write("Stopped")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {totals['sent']}, retry later {totals['pending']}, dead-lettered {totals['dead']}"
+        ))
+        self.print_stats()
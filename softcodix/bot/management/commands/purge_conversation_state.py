@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from bot.state_store import get_state_store
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned conversation state older than CONVERSATION_STATE_TTL (cron; no-op for cache backends)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"purged {get_state_store().purge()} conversation state row(s)")
@@ -1,10 +1,36 @@
 from django.core.management.base import BaseCommand
+from bot.retrieval import build_passage_index
 from bot.web_scrap import scrape_all_pages
 
 class Command(BaseCommand):
     help = "Scrape entire site and save into PageContent"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=50, help="Max pages to scrape")
+        parser.add_argument("--concurrency", type=int, default=None, help="Fetches in flight (default: CRAWL_CONCURRENCY)")
+        parser.add_argument("--per-host", type=int, default=None, help="Max parallel requests per host")
+        parser.add_argument("--delay", type=float, default=None, help="Min seconds between requests to one host")
+        parser.add_argument("--batch-size", type=int, default=None, help="Pages per bulk upsert (default: CRAWL_BATCH_SIZE)")
+        parser.add_argument("--full", action="store_true", help="Ignore ETag/hash and re-download every page")
+
     def handle(self, *args, **options):
         domain = "https://softcodix.com"   # 👈 apna domain fix kar do
-        visited = scrape_all_pages(domain, limit=50)  # limit = max pages
+        stats = {}
+        visited = scrape_all_pages(
+            domain,
+            limit=options["limit"],  # limit = max pages
+            concurrency=options["concurrency"],
+            per_host=options["per_host"],
+            delay=options["delay"],
+            incremental=not options["full"],
+            stats=stats,
+            batch_size=options["batch_size"],
+        )
         self.stdout.write(self.style.SUCCESS(f"Scraped {len(visited)} pages from {domain}"))
+        self.stdout.write(
+            f"Unchanged (skipped): {stats['unchanged']} | Written: {stats['written']} | Failed: {stats['failed']}"
+        )
+
+        if stats["written"]:
+            count = build_passage_index()
+            self.stdout.write(f"Retrieval index rebuilt with {count} passages")
@@ -0,0 +1,143 @@
+"""Per-stage latency histograms and counters, rendered in Prometheus text format
+
+Metrics live in the worker process: each gunicorn/uvicorn worker serves its
+own /metrics, so scrape every worker (or run one per container). Recording
+is a perf_counter pair, a bisect and a short lock - cheap enough to stay on
+in production.
+"""
+import bisect
+import threading
+import time
+
+# Log-spaced bucket bounds: 0.5 ms ... ~28 s (x1.5 per bucket)
+BUCKETS = tuple(round(0.0005 * 1.5 ** i, 6) for i in range(28))
+QUANTILES = (0.5, 0.95, 0.99)
+MAX_INTENTS = 50   # label cardinality cap - baaki sab "other"
+
+STAGE_METRIC = "bot_stage_duration_seconds"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear inside the bucket the rank falls in)"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class Timer:
+    """`with metrics.timer("gemini"):` - records the block's duration, exceptions included"""
+
+    __slots__ = ("metrics", "stage", "intent", "start")
+
+    def __init__(self, metrics, stage, intent):
+        self.metrics = metrics
+        self.stage = stage
+        self.intent = intent
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.intent)
+
+
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(pairs):
+    return "{" + ",".join(f'{key}="{label_value(value)}"' for key, value in pairs) + "}" if pairs else ""
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # (stage, intent) -> Histogram
+        self.counters = {}     # (name, ((label, value), ...)) -> int
+        self.intents = set()
+
+    def observe(self, stage, seconds, intent=None):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            if intent is not None and intent not in self.intents:
+                if len(self.intents) >= MAX_INTENTS:
+                    intent = "other"
+                else:
+                    self.intents.add(intent)
+            histogram = self.histograms.get((stage, intent))
+            if histogram is None:
+                histogram = self.histograms[(stage, intent)] = Histogram()
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def timer(self, stage, intent=None):
+        return Timer(self, stage, intent)
+
+    def incr(self, name, amount=1, **label_pairs):
+        key = (name, tuple(sorted(label_pairs.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def value(self, name, **label_pairs):
+        return self.counters.get((name, tuple(sorted(label_pairs.items()))), 0)
+
+    def histogram(self, stage, intent=None):
+        return self.histograms.get((stage, intent))
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.intents.clear()
+
+    def render(self):
+        """Prometheus text exposition (format 0.0.4)"""
+        with self.lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, [h.quantile(q) for q in QUANTILES])
+                          for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = [f"# HELP {STAGE_METRIC} Webhook time per stage (and intent where known).",
+                 f"# TYPE {STAGE_METRIC} histogram"]
+        quantile_lines = []
+        for (stage, intent), (counts, total, count, quantiles) in sorted(histograms.items(), key=str):
+            pairs = [("stage", stage)] + ([("intent", intent)] if intent is not None else [])
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{STAGE_METRIC}_bucket{labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{STAGE_METRIC}_sum{labels(pairs)} {total:.6f}")
+            lines.append(f"{STAGE_METRIC}_count{labels(pairs)} {count}")
+            for q, value in zip(QUANTILES, quantiles):
+                quantile_lines.append(f"{STAGE_METRIC}_quantile{labels(pairs + [('quantile', q)])} {value:.6f}")
+        if quantile_lines:
+            lines += [f"# HELP {STAGE_METRIC}_quantile p50/p95/p99 estimated from the histogram buckets.",
+                      f"# TYPE {STAGE_METRIC}_quantile gauge", *quantile_lines]
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter, pairs), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"{name}{labels(pairs)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS bot_pagecontent_fts "
+        "USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+    )
+    # Backfill existing pages
+    schema_editor.execute(
+        "INSERT INTO bot_pagecontent_fts (rowid, title, content) "
+        "SELECT id, COALESCE(title, ''), content FROM bot_pagecontent"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS bot_pagecontent_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_pagecontent_page'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
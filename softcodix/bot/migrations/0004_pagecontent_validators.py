@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_pagecontent_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagecontent',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
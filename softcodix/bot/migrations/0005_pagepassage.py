@@ -0,0 +1,80 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of bot.passages.chunk_text as of this migration - historical
+# migrations must not change when the live chunker (or its imports) does
+PASSAGE_SIZE = 600
+PASSAGE_OVERLAP = 150
+WORD_RE = re.compile(r"\S+")
+
+
+def chunk_text(text, size=PASSAGE_SIZE, overlap=PASSAGE_OVERLAP):
+    words = [(m.start(), m.end()) for m in WORD_RE.finditer(text)]
+    chunks = []
+    first = 0
+    while first < len(words):
+        last = first
+        while last + 1 < len(words) and words[last + 1][1] - words[first][0] <= size:
+            last += 1
+        chunks.append(text[words[first][0]:words[last][1]])
+        if last + 1 >= len(words):
+            break
+        next_first = last + 1
+        while next_first - 1 > first and words[last][1] - words[next_first - 1][0] <= overlap:
+            next_first -= 1
+        first = next_first
+    return chunks
+
+
+def create_passages(apps, schema_editor):
+    PageContent = apps.get_model("bot", "PageContent")
+    PagePassage = apps.get_model("bot", "PagePassage")
+    PagePassage.objects.bulk_create(
+        PagePassage(page_id=page.pk, position=position, text=chunk)
+        for page in PageContent.objects.iterator()
+        for position, chunk in enumerate(chunk_text(page.content))
+    )
+
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS bot_pagepassage_fts "
+        "USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO bot_pagepassage_fts (rowid, text) SELECT id, text FROM bot_pagepassage"
+    )
+
+
+def drop_passages_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS bot_pagepassage_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_pagecontent_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagePassage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='bot.pagecontent')),
+            ],
+            options={
+                'ordering': ['page', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('page', 'position'), name='unique_page_passage')],
+            },
+        ),
+        migrations.RunPython(create_passages, drop_passages_fts),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0006_leadoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(blank=True, max_length=50)),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('phone', models.CharField(blank=True, max_length=50)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('session', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['service', 'created_at'], name='lead_service_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeadAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('question', models.TextField()),
+                ('answer', models.TextField(blank=True)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='bot.lead')),
+            ],
+            options={
+                'ordering': ['lead', 'position'],
+            },
+        ),
+    ]
@@ -1,13 +1,101 @@
 from django.db import models
+from django.utils import timezone
 
 class PageContent(models.Model):
     url = models.URLField(max_length=500, unique=True)   # store full URL
     page = models.CharField(max_length=200, blank=True)  # optional path name
     title = models.CharField(max_length=255, blank=True, null=True)
     content = models.TextField()
+    etag = models.CharField(max_length=255, blank=True)           # HTTP ETag from last fetch
+    last_modified = models.CharField(max_length=64, blank=True)   # HTTP Last-Modified (raw header)
+    content_hash = models.CharField(max_length=64, blank=True)    # sha256 of raw response body
     last_scraped = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.url
 
 
+
+class PagePassage(models.Model):
+    """Overlapping chunk of a page's text, indexed for passage-level search"""
+    page = models.ForeignKey(PageContent, on_delete=models.CASCADE, related_name="passages")
+    position = models.PositiveIntegerField()   # chunk number inside the page
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["page", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["page", "position"], name="unique_page_passage"),
+        ]
+
+    def __str__(self):
+        return f"{self.page.url} #{self.position}"
+
+
+class LeadOutbox(models.Model):
+    """Pending lead notification, written by the webhook and drained by `process_outbox`"""
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENDING, "Sending"), (SENT, "Sent"), (DEAD, "Dead")]
+
+    payload = models.JSONField()                 # lead_data dict (service, name, phone, email, answers)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)   # SENDING: lease expiry
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.payload.get('email', '?')} ({self.status})"
+
+
+class Lead(models.Model):
+    """Completed chatbot lead (contact details + service questionnaire)"""
+    service = models.CharField(max_length=50, blank=True)
+    name = models.CharField(max_length=200, blank=True)
+    phone = models.CharField(max_length=50, blank=True)
+    email = models.CharField(max_length=254, blank=True)   # as typed by the user, may be invalid
+    session = models.CharField(max_length=255, blank=True)  # Dialogflow session path
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["service", "created_at"], name="lead_service_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} <{self.email}> ({self.service})"
+
+
+class LeadAnswer(models.Model):
+    """One question / answer pair from the service questionnaire"""
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="answers")
+    position = models.PositiveIntegerField()
+    question = models.TextField()
+    answer = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["lead", "position"]
+
+    def __str__(self):
+        return f"{self.question} = {self.answer}"
+
+
+class ConversationState(models.Model):
+    """Service questionnaire / contact details of one Dialogflow session (see bot/state_store.py)"""
+    session = models.CharField(max_length=255, unique=True)   # Dialogflow session path
+    state = models.JSONField()                                # token, service, position, answers, name, phone
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)   # TTL / purge
+
+    def __str__(self):
+        return f"{self.session} ({self.state.get('service')})"
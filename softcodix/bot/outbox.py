@@ -0,0 +1,137 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from .mailer import close_thread_connections, thread_connection
+from .models import LeadOutbox
+
+OPEN_STATUSES = (LeadOutbox.PENDING, LeadOutbox.SENDING)
+
+
+def enqueue_lead_email(lead_data):
+    """Queue the lead notification emails - the webhook pays for one INSERT, the worker does SMTP"""
+    return LeadOutbox.objects.create(payload=lead_data)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped, half of it randomised"""
+    base = getattr(settings, "OUTBOX_BACKOFF_BASE", 30)
+    cap = getattr(settings, "OUTBOX_BACKOFF_CAP", 3600)
+    delay = min(cap, base * 2 ** max(0, attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_batch(limit, lease=None):
+    """Lease up to `limit` due rows to this worker (crashed workers' leases simply expire)"""
+    lease = lease if lease is not None else getattr(settings, "OUTBOX_LEASE", 300)
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=lease)
+    due = LeadOutbox.objects.filter(status__in=OPEN_STATUSES, next_attempt_at__lte=now)
+    with transaction.atomic():
+        ids = list(due.order_by("next_attempt_at").values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        # Conditional UPDATE - agar doosre worker ne row pehle le li to yahan match nahi hogi
+        due.filter(id__in=ids).update(
+            status=LeadOutbox.SENDING, next_attempt_at=lease_until, attempts=F("attempts") + 1
+        )
+        return list(LeadOutbox.objects.filter(
+            id__in=ids, status=LeadOutbox.SENDING, next_attempt_at=lease_until
+        ))
+
+
+def deliver(entry):
+    """Send one lead's emails; True sent, False rejected (bad lead data), raises on transient errors"""
+    from .views import send_lead_email   # views imports this module for enqueue_lead_email
+    reusable = thread_connection()
+    try:
+        sent = send_lead_email(entry.payload, raise_errors=True, connection=reusable.get())
+    except Exception:
+        reusable.close()   # connection ka haal pata nahi - agla lead naya connection khole
+        raise
+    reusable.sent(2 if sent else 0)
+    return sent
+
+
+def record_result(entry, sent, error=None, max_attempts=None):
+    """Store the outcome of one delivery; returns the entry's new status"""
+    max_attempts = max_attempts or getattr(settings, "OUTBOX_MAX_ATTEMPTS", 6)
+    now = timezone.now()
+    rows = LeadOutbox.objects.filter(pk=entry.pk)
+    if sent:
+        rows.update(status=LeadOutbox.SENT, sent_at=now, last_error="")
+        return LeadOutbox.SENT
+    if error is None:
+        rows.update(status=LeadOutbox.DEAD, last_error="Rejected: lead has no valid email address")
+        return LeadOutbox.DEAD
+    error_text = f"{type(error).__name__}: {error}"
+    if entry.attempts >= max_attempts:
+        rows.update(status=LeadOutbox.DEAD, last_error=error_text)
+        return LeadOutbox.DEAD
+    rows.update(
+        status=LeadOutbox.PENDING,
+        next_attempt_at=now + timedelta(seconds=backoff_delay(entry.attempts)),
+        last_error=error_text,
+    )
+    return LeadOutbox.PENDING
+
+
+def drain_once(executor, batch_size, max_attempts=None):
+    """Claim one batch and deliver it on `executor`; returns {status: count}"""
+    batch = claim_batch(batch_size)
+    counts = {LeadOutbox.SENT: 0, LeadOutbox.PENDING: 0, LeadOutbox.DEAD: 0}
+    futures = {executor.submit(deliver, entry): entry for entry in batch}
+    # DB writes sirf is thread se - sending threads sirf SMTP karte hain
+    for future in as_completed(futures):
+        entry = futures[future]
+        try:
+            status = record_result(entry, future.result(), max_attempts=max_attempts)
+        except Exception as e:
+            status = record_result(entry, False, error=e, max_attempts=max_attempts)
+        counts[status] += 1
+    return counts
+
+
+def drain(concurrency=None, batch_size=None, once=False, poll_interval=None, max_attempts=None, report=None):
+    """Worker loop: keep draining due rows with at most `concurrency` sends in flight"""
+    concurrency = concurrency or getattr(settings, "OUTBOX_CONCURRENCY", 4)
+    batch_size = batch_size or getattr(settings, "OUTBOX_BATCH_SIZE", 20)
+    poll_interval = poll_interval if poll_interval is not None else getattr(settings, "OUTBOX_POLL_INTERVAL", 2)
+    totals = {LeadOutbox.SENT: 0, LeadOutbox.PENDING: 0, LeadOutbox.DEAD: 0}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox") as executor:
+        try:
+            while True:
+                start = time.monotonic()
+                counts = drain_once(executor, batch_size, max_attempts)
+                handled = sum(counts.values())
+                for status, count in counts.items():
+                    totals[status] += count
+                if handled and report:
+                    report(counts, time.monotonic() - start)
+                if handled < batch_size:
+                    if once:
+                        return totals
+                    time.sleep(poll_interval)
+        finally:
+            close_thread_connections()
+
+
+def queue_stats():
+    """Queue depth, dead letters, oldest waiting lead and recent throughput"""
+    now = timezone.now()
+    by_status = dict(LeadOutbox.objects.values_list("status").annotate(n=Count("id")).order_by())
+    oldest = LeadOutbox.objects.filter(status__in=OPEN_STATUSES).aggregate(oldest=Min("created_at"))["oldest"]
+    return {
+        "pending": by_status.get(LeadOutbox.PENDING, 0),
+        "sending": by_status.get(LeadOutbox.SENDING, 0),
+        "sent": by_status.get(LeadOutbox.SENT, 0),
+        "dead": by_status.get(LeadOutbox.DEAD, 0),
+        "oldest_open_age_s": (now - oldest).total_seconds() if oldest else 0.0,
+        "sent_last_hour": LeadOutbox.objects.filter(
+            status=LeadOutbox.SENT, sent_at__gte=now - timedelta(hours=1)
+        ).count(),
+    }
@@ -0,0 +1,50 @@
+import re
+from django.conf import settings
+from django.db import transaction
+from .models import PagePassage
+from .search import index_passages, unindex_passages
+
+WORD_RE = re.compile(r"\S+")
+
+
+def chunk_text(text, size=None, overlap=None):
+    """Split text into overlapping chunks of ~`size` characters on word boundaries"""
+    if size is None:
+        size = getattr(settings, "PASSAGE_SIZE", 600)
+    if overlap is None:
+        overlap = getattr(settings, "PASSAGE_OVERLAP", 150)
+
+    words = [(m.start(), m.end()) for m in WORD_RE.finditer(text)]
+    chunks = []
+    first = 0
+    while first < len(words):
+        # Jitne words `size` mein aa sakein
+        last = first
+        while last + 1 < len(words) and words[last + 1][1] - words[first][0] <= size:
+            last += 1
+        chunks.append(text[words[first][0]:words[last][1]])
+        if last + 1 >= len(words):
+            break
+        # Agla chunk `overlap` characters peeche se start karo
+        next_first = last + 1
+        while next_first - 1 > first and words[last][1] - words[next_first - 1][0] <= overlap:
+            next_first -= 1
+        first = next_first
+    return chunks
+
+
+def rebuild_passages(pages):
+    """Replace the stored + indexed passages of the given pages"""
+    pages = list(pages)
+    if not pages:
+        return
+    page_ids = [page.pk for page in pages]
+    with transaction.atomic():
+        unindex_passages(page_ids)
+        PagePassage.objects.filter(page_id__in=page_ids).delete()
+        passages = PagePassage.objects.bulk_create(
+            PagePassage(page_id=page.pk, position=position, text=chunk)
+            for page in pages
+            for position, chunk in enumerate(chunk_text(page.content))
+        )
+        index_passages(passages)
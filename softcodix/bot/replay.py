@@ -0,0 +1,146 @@
+"""Replay a corpus of recorded Dialogflow requests through the webhook and measure each turn
+
+Used by WebhookReplayBenchmark in tests.py: the corpus lives in
+testdata/webhook_corpus.json together with its regression thresholds.
+Per intent it reports latency percentiles, DB queries per turn and the
+peak Python allocation of a turn.
+"""
+import json
+import logging
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .fakes import StubGeminiSession
+from .llm_cache import get_response_cache
+from .semantic_cache import get_semantic_cache
+
+CORPUS_PATH = Path(__file__).resolve().parent / "testdata" / "webhook_corpus.json"
+
+
+def load_corpus(path=CORPUS_PATH):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+@contextmanager
+def stubbed_gemini(reply="Softcodix stub answer"):
+    stub = StubGeminiSession(reply)
+    with mock.patch("bot.views.get_session", return_value=stub):
+        yield stub
+
+
+@contextmanager
+def bot_log_level(level):
+    bot_logger = logging.getLogger("bot")
+    saved = bot_logger.level
+    bot_logger.setLevel(level)
+    try:
+        yield
+    finally:
+        bot_logger.setLevel(saved)
+
+
+def post_turn(client, turn, path):
+    return client.post(path, data=json.dumps(turn["request"]), content_type="application/json")
+
+
+def check_reply(turn, response):
+    """Problem string, or None when the reply starts with the turn's expected text"""
+    if response.status_code != 200:
+        return f"{turn['name']}: HTTP {response.status_code}"
+    text = response.json().get("fulfillmentText", "")
+    if not text and "fulfillmentMessages" in response.json():
+        text = response.json()["fulfillmentMessages"][0]["text"]["text"][0]
+    if not text.startswith(turn["expect"]):
+        return f"{turn['name']}: expected {turn['expect']!r}, got {text[:60]!r}"
+    return None
+
+
+def replay(client, corpus, rounds=5, path="/webhook/", log_level=logging.WARNING):
+    """Run the corpus `rounds` times; returns ({intent: samples}, [reply problems])
+
+    LLM caches are cleared before each round so LLM turns always reach the
+    (stubbed) Gemini call. One extra round runs under tracemalloc for the
+    allocation figures, so tracing never skews the timings. Pass
+    log_level=logging.INFO to include production logging in the timings.
+    """
+    samples, problems = {}, []
+    with bot_log_level(log_level):
+        for turn in corpus["turns"]:   # warm-up: imports, template / statement caches
+            post_turn(client, turn, path)
+
+        for _ in range(rounds):
+            get_response_cache().clear()
+            get_semantic_cache().clear()
+            for turn in corpus["turns"]:
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = post_turn(client, turn, path)
+                    elapsed = time.perf_counter() - start
+                intent = turn["request"]["queryResult"]["intent"]["displayName"]
+                entry = samples.setdefault(intent, {"ms": [], "queries": [], "alloc_kib": []})
+                entry["ms"].append(elapsed * 1000)
+                entry["queries"].append(len(queries))
+                problem = check_reply(turn, response)
+                if problem and problem not in problems:
+                    problems.append(problem)
+
+        get_response_cache().clear()
+        get_semantic_cache().clear()
+        tracemalloc.start()
+        try:
+            for turn in corpus["turns"]:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                post_turn(client, turn, path)
+                peak = tracemalloc.get_traced_memory()[1]
+                intent = turn["request"]["queryResult"]["intent"]["displayName"]
+                samples[intent]["alloc_kib"].append((peak - base) / 1024)
+        finally:
+            tracemalloc.stop()
+    return samples, problems
+
+
+def summarize(samples):
+    return {
+        intent: {
+            "turns": len(entry["ms"]),
+            "p50_ms": percentile(entry["ms"], 0.50),
+            "p95_ms": percentile(entry["ms"], 0.95),
+            "p99_ms": percentile(entry["ms"], 0.99),
+            "queries": max(entry["queries"]),
+            "alloc_kib": max(entry["alloc_kib"]),
+        }
+        for intent, entry in samples.items()
+    }
+
+
+def check_thresholds(summary, thresholds):
+    """Regressions as readable strings; thresholds[intent] falls back to thresholds["*"]"""
+    failures = []
+    for intent, stats in sorted(summary.items()):
+        limits = {**thresholds.get("*", {}), **thresholds.get(intent, {})}
+        for metric, limit in sorted(limits.items()):
+            if stats[metric] > limit:
+                failures.append(f"{intent}: {metric} {stats[metric]:.2f} > {limit}")
+    return failures
+
+
+def format_report(summary):
+    lines = [f"{'intent':28} {'turns':>5} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'queries':>7} {'alloc KiB':>9}"]
+    for intent, s in sorted(summary.items()):
+        lines.append(
+            f"{intent:28} {s['turns']:5d} {s['p50_ms']:7.2f} {s['p95_ms']:7.2f} {s['p99_ms']:7.2f} "
+            f"{s['queries']:7d} {s['alloc_kib']:9.1f}"
+        )
+    return "\n".join(lines)
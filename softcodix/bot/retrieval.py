@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .models import PagePassage
+from .search import STOPWORDS, TOKEN_RE
+
+# RETRIEVAL_INDEX_DIR/meta.json names the current build; each build is an immutable
+# builds/<build id>/ directory holding the three arrays
+VECTORS_FILE = "vectors.npy"   # float32 (passages x dim), rows L2-normalised
+IDS_FILE = "ids.npy"           # int64 PagePassage ids, same row order
+IDF_FILE = "idf.npy"           # float32 (dim,) idf weight per hashed bucket
+META_FILE = "meta.json"
+BUILDS_DIR = "builds"
+KEEP_BUILDS = 2   # current + previous, for workers still loading the old one
+
+COMPANY_INFO = "Softcodix is an IT solutions company providing AI, automation, and custom development."
+
+
+def index_dir():
+    return Path(getattr(settings, "RETRIEVAL_INDEX_DIR", settings.BASE_DIR / "retrieval_index"))
+
+
+def hashed_features(text, dim):
+    """Word unigrams + bigrams hashed into `dim` signed buckets (sublinear tf)"""
+    tokens = [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+    grams = Counter(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    indices = np.empty(len(grams), dtype=np.int64)
+    values = np.empty(len(grams), dtype=np.float32)
+    for i, (gram, count) in enumerate(grams.items()):
+        # crc32 is stable across processes (hash() is salted per process)
+        h = zlib.crc32(gram.encode("utf-8"))
+        indices[i] = h % dim
+        values[i] = (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+    return indices, values
+
+
+def vectorize(text, dim):
+    vector = np.zeros(dim, dtype=np.float32)
+    indices, values = hashed_features(text, dim)
+    np.add.at(vector, indices, values)
+    return vector
+
+
+def build_index(rows, dim=None, path=None):
+    """Build the passage matrix from (passage_id, text) rows and atomically make it current"""
+    dim = dim or getattr(settings, "RETRIEVAL_DIM", 384)
+    path = Path(path or index_dir())
+    builds = path / BUILDS_DIR
+    builds.mkdir(parents=True, exist_ok=True)
+
+    ids, vectors = [], []
+    for passage_id, text in rows:
+        ids.append(passage_id)
+        vectors.append(vectorize(text, dim))
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, dim), dtype=np.float32)
+
+    # idf per bucket, phir rows ko unit length par normalise
+    df = np.count_nonzero(matrix, axis=0)
+    idf = (np.log((1 + len(ids)) / (1 + df)) + 1).astype(np.float32)
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    # Naye build directory mein likho, phir meta.json ek rename mein us par point kare -
+    # workers ko vectors / ids / idf hamesha ek hi build ke milte hain
+    build = f"{time.time_ns():020d}-{os.getpid()}"
+    tmp_dir = builds / f".{build}.tmp"
+    tmp_dir.mkdir()
+    for name, array in ((VECTORS_FILE, matrix), (IDS_FILE, np.asarray(ids, dtype=np.int64)), (IDF_FILE, idf)):
+        with open(tmp_dir / name, "wb") as f:
+            np.save(f, array)
+    os.replace(tmp_dir, builds / build)
+    tmp = path / f".{META_FILE}.{build}.tmp"
+    tmp.write_text(json.dumps({"build": build, "dim": dim, "count": len(ids)}))
+    os.replace(tmp, path / META_FILE)
+    prune_builds(builds, keep=build)
+    return len(ids)
+
+
+def prune_builds(builds, keep):
+    """Delete all but the newest KEEP_BUILDS builds (never `keep`, the one just made current)"""
+    names = sorted(p.name for p in builds.iterdir() if not p.name.startswith("."))
+    for name in names[:-KEEP_BUILDS]:
+        if name != keep:
+            shutil.rmtree(builds / name, ignore_errors=True)
+
+
+def build_passage_index(dim=None, path=None):
+    """Rebuild the on-disk index from every stored PagePassage"""
+    rows = PagePassage.objects.values_list("id", "text").iterator(chunk_size=2000)
+    return build_index(rows, dim=dim, path=path)
+
+
+class VectorIndex:
+    """Read-only, memory-mapped passage matrix (shared page cache across workers)"""
+
+    def __init__(self, path):
+        path = Path(path)
+        with open(path / META_FILE, encoding="utf-8") as f:   # mtime + content of the same file
+            self.meta_mtime = os.fstat(f.fileno()).st_mtime_ns
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.build = meta.get("build")
+        # Sab arrays usi build directory se jo meta.json ne naam di (purane indexes: seedha path)
+        files = path / BUILDS_DIR / self.build if self.build else path
+        self.vectors = np.load(files / VECTORS_FILE, mmap_mode="r")
+        self.ids = np.load(files / IDS_FILE, mmap_mode="r")
+        self.idf = np.load(files / IDF_FILE)
+
+    def query_vector(self, text):
+        vector = vectorize(text, self.dim) * self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def top_k(self, text, k=5):
+        """Cosine top-k as [(passage_id, score)], best first"""
+        if not len(self.ids):
+            return []
+        query = self.query_vector(text)
+        if not query.any():
+            return []
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        best = np.argpartition(scores, len(scores) - k)[-k:]
+        best = best[np.argsort(scores[best])[::-1]]
+        return [(int(self.ids[i]), float(scores[i])) for i in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Per-process index, re-mapped only when a rebuild replaced the files"""
+    global _index
+    path = index_dir()
+    try:
+        mtime = os.stat(path / META_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _index is None or _index.meta_mtime != mtime:
+        with _index_lock:
+            if _index is None or _index.meta_mtime != mtime:
+                _index = VectorIndex(path)
+    return _index
+
+
+def index_version():
+    """Changes whenever the index is rebuilt (used to version cached answers)"""
+    try:
+        return str(os.stat(index_dir() / META_FILE).st_mtime_ns)
+    except FileNotFoundError:
+        return ""
+
+
+def retrieve_passages(user_query, k=None):
+    """Top-k PagePassage objects for a query (each with a `.score`)"""
+    k = k or getattr(settings, "RETRIEVAL_TOP_K", 4)
+    index = get_index()
+    if index is None:
+        return []
+    min_score = getattr(settings, "RETRIEVAL_MIN_SCORE", 0.1)
+    hits = [(pid, score) for pid, score in index.top_k(user_query, k) if score >= min_score]
+    passages = PagePassage.objects.in_bulk([pid for pid, _ in hits])
+    result = []
+    for pid, score in hits:
+        if pid in passages:   # passage rebuild ke baad stale id ho sakti hai
+            passages[pid].score = score
+            result.append(passages[pid])
+    return result
+
+
+def build_prompt_context(user_query):
+    """Company info + the most relevant scraped passages, capped in size"""
+    max_chars = getattr(settings, "RETRIEVAL_CONTEXT_CHARS", 2000)
+    parts = [COMPANY_INFO]
+    used = len(COMPANY_INFO)
+    for passage in retrieve_passages(user_query):
+        if used + len(passage.text) > max_chars:
+            break
+        parts.append(passage.text)
+        used += len(passage.text)
+    return "\n\n".join(parts)
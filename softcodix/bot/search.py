@@ -0,0 +1,192 @@
+import re
+from django.conf import settings
+from django.db import connection
+from .models import PageContent, PagePassage
+
+# SQLite FTS5 table jo PageContent ko mirror karta hai (rowid = PageContent.id)
+FTS_TABLE = "bot_pagecontent_fts"
+# Passage-level FTS5 table (rowid = PagePassage.id)
+PASSAGE_FTS_TABLE = "bot_pagepassage_fts"
+
+# Common English / Roman Urdu filler words - inko match karne ka koi faida nahi
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did",
+    "i", "you", "we", "they", "it", "me", "my", "your", "our", "of", "to",
+    "in", "on", "for", "and", "or", "with", "what", "which", "how", "can",
+    "please", "about", "tell", "hai", "hain", "ka", "ki", "ke", "ko", "kya",
+    "kia", "mein", "main", "se", "aur", "bhi", "hum", "aap", "mujhe", "koi",
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_enabled():
+    """FTS5 sirf SQLite par available hai"""
+    return connection.vendor == "sqlite"
+
+
+def query_terms(user_query):
+    """Lowercased, de-duplicated search terms without stopwords"""
+    terms = []
+    for token in TOKEN_RE.findall(user_query.lower()):
+        if len(token) < 2 or token in STOPWORDS or token in terms:
+            continue
+        terms.append(token)
+    return terms
+
+
+def build_match_query(user_query):
+    """Turn a free-text user sentence into a safe FTS5 MATCH expression"""
+    # Every term is quoted so FTS5 operators in user input are treated as text
+    return " ".join(f'"{term}"' for term in query_terms(user_query))
+
+
+def index_page(page):
+    """Insert or refresh a single page in the FTS index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [page.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)",
+            [page.pk, page.title or "", page.content],
+        )
+
+
+def index_pages(pages):
+    """Refresh many pages in the FTS index at once (bulk_create skips post_save)"""
+    if not fts_enabled():
+        return
+    rows = [(page.pk, page.title or "", page.content) for page in pages]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", rows
+        )
+
+
+def unindex_page(page_id):
+    """Remove a page from the FTS index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [page_id])
+
+
+def index_passages(passages):
+    """Add freshly created passages to the passage FTS index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {PASSAGE_FTS_TABLE} (rowid, text) VALUES (%s, %s)",
+            [(passage.pk, passage.text) for passage in passages],
+        )
+
+
+def unindex_passages(page_ids):
+    """Remove all passages of the given pages from the passage FTS index"""
+    if not fts_enabled() or not page_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(page_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {PASSAGE_FTS_TABLE} WHERE rowid IN "
+            f"(SELECT id FROM bot_pagepassage WHERE page_id IN ({placeholders}))",
+            list(page_ids),
+        )
+
+
+def rebuild_index():
+    """Rebuild the whole FTS index from PageContent (e.g. after bulk writes)"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content) "
+            f"SELECT id, COALESCE(title, ''), content FROM bot_pagecontent"
+        )
+        cursor.execute(f"DELETE FROM {PASSAGE_FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {PASSAGE_FTS_TABLE} (rowid, text) SELECT id, text FROM bot_pagepassage"
+        )
+
+
+def search_pages(user_query, limit=None):
+    """Return the top-k PageContent rows for a query, best BM25 score first"""
+    if limit is None:
+        limit = getattr(settings, "SEARCH_TOP_K", 3)
+
+    if not fts_enabled():
+        # Non-SQLite databases: purana icontains path
+        return list(PageContent.objects.filter(content__icontains=user_query)[:limit])
+
+    match = build_match_query(user_query)
+    if not match:
+        return []
+
+    # Single query: MATCH + bm25 ranking + join back to the page row
+    sql = (
+        f"SELECT p.id, p.url, p.page, p.title, p.content, p.last_scraped, "
+        f"bm25({FTS_TABLE}) AS score "
+        f"FROM {FTS_TABLE} JOIN bot_pagecontent p ON p.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s ORDER BY score LIMIT %s"
+    )
+    return list(PageContent.objects.raw(sql, [match, limit]))
+
+
+def search_passages(user_query, limit=None):
+    """Return the top-k PagePassage rows for a query, best BM25 score first"""
+    if limit is None:
+        limit = getattr(settings, "SEARCH_TOP_K", 3)
+
+    if not fts_enabled():
+        return list(PagePassage.objects.filter(text__icontains=user_query)[:limit])
+
+    match = build_match_query(user_query)
+    if not match:
+        return []
+
+    sql = (
+        f"SELECT p.id, p.page_id, p.position, p.text, bm25({PASSAGE_FTS_TABLE}) AS score "
+        f"FROM {PASSAGE_FTS_TABLE} JOIN bot_pagepassage p ON p.id = {PASSAGE_FTS_TABLE}.rowid "
+        f"WHERE {PASSAGE_FTS_TABLE} MATCH %s ORDER BY score LIMIT %s"
+    )
+    return list(PagePassage.objects.raw(sql, [match, limit]))
+
+
+def centred_snippet(text, user_query, width=400):
+    """Cut a `width`-char window out of text, centred on the densest cluster of query terms"""
+    if len(text) <= width:
+        return text
+
+    terms = query_terms(user_query)
+    hits = sorted(
+        m.start()
+        for term in terms
+        for m in re.finditer(rf"\b{re.escape(term)}\b", text, re.IGNORECASE)
+    )
+    if not hits:
+        return text[:width].rsplit(" ", 1)[0] + " …"
+
+    # Sliding window: woh hit jiske aas paas sab se zyada matches hain
+    best_centre, best_count, j = hits[0], 0, 0
+    for i, pos in enumerate(hits):
+        while hits[j] < pos - width // 2:
+            j += 1
+        count = i - j + 1
+        if count > best_count:
+            best_count, best_centre = count, (hits[j] + pos) // 2
+    start = max(0, min(best_centre - width // 2, len(text) - width))
+    end = start + width
+
+    # Words ko beech se na kaato
+    if start > 0:
+        start = text.find(" ", start) + 1 or start
+    if end < len(text):
+        cut = text.rfind(" ", start, end)
+        if cut > start:
+            end = cut
+    snippet = text[start:end].strip()
+    return ("… " if start > 0 else "") + snippet + (" …" if end < len(text) else "")
@@ -0,0 +1,164 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+import numpy as np
+from django.conf import settings
+from .llm_cache import normalize_query
+from .search import STOPWORDS
+
+# MinHash: NUM_PERM hash functions, split into BANDS bands for LSH bucketing
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+
+_rng = np.random.RandomState(1337)   # fixed seed -> same signatures in every worker
+PERM_A = _rng.randint(1, PRIME, size=NUM_PERM).astype(np.uint64)
+PERM_B = _rng.randint(0, PRIME, size=NUM_PERM).astype(np.uint64)
+
+
+# Roman Urdu request fillers ("bana sakte ho", "chahiye") - meaning nahi badalte
+QUERY_FILLERS = {"chahiye", "bana", "banao", "sakte", "sakta", "ho", "do", "karo", "batao", "plz", "pls"}
+
+
+def query_tokens(user_query):
+    """Content words with a light plural strip ("rates" -> "rate")"""
+    tokens = []
+    for token in normalize_query(user_query).split():
+        if token in STOPWORDS or token in QUERY_FILLERS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def shingles(user_query):
+    """Whole words ("w:" prefix) + character trigrams (Roman Urdu spelling variations ke liye)"""
+    result = set()
+    for token in query_tokens(user_query):
+        result.add(f"w:{token}")
+        padded = f"#{token}#"
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(result)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def similarity(a, b):
+    """Mean of word-level and trigram-level Jaccard
+
+    Trigrams alone forgive spelling variants but barely notice a short extra
+    word ("seo services" vs "services"); the word term penalises that.
+    """
+    words_a = {s for s in a if s.startswith("w:")}
+    words_b = {s for s in b if s.startswith("w:")}
+    return (jaccard(words_a, words_b) + jaccard(a - words_a, b - words_b)) / 2
+
+
+def minhash(shingle_set):
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64, count=len(shingle_set)
+    )
+    return ((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % PRIME).min(axis=1)
+
+
+def band_keys(signature):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+class SemanticCache:
+    """Near-duplicate query cache: MinHash LSH for candidates, exact similarity to confirm"""
+
+    def __init__(self, threshold=0.7, maxsize=5000, ttl=3600):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()        # entry_id -> (shingles, bands, answer, version, expires_at)
+        self._buckets = defaultdict(set)     # (band, band_hash) -> entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _remove(self, entry_id):
+        _, bands, _, _, _ = self._entries.pop(entry_id)
+        for key in bands:
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def lookup(self, user_query, version=""):
+        """Return (answer, similarity) of the closest earlier query, or (None, 0.0)"""
+        query_shingles = shingles(user_query)
+        if not query_shingles:
+            return None, 0.0
+        bands = band_keys(minhash(query_shingles))
+        now = time.monotonic()
+
+        with self._lock:
+            candidates = set()
+            for key in bands:
+                candidates |= self._buckets.get(key, set())
+
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                entry_shingles, _, _, entry_version, expires_at = self._entries[entry_id]
+                if expires_at < now or entry_version != version:
+                    self._remove(entry_id)
+                    continue
+                score = similarity(query_shingles, entry_shingles)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None, best_score
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2], best_score
+
+    def add(self, user_query, answer, version=""):
+        query_shingles = shingles(user_query)
+        if not query_shingles:
+            return
+        bands = band_keys(minhash(query_shingles))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (query_shingles, bands, answer, version, time.monotonic() + self.ttl)
+            for key in bands:
+                self._buckets[key].add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "threshold": self.threshold}
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Process-wide semantic cache, configured from settings"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    threshold=getattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.7),
+                    maxsize=getattr(settings, "SEMANTIC_CACHE_SIZE", 5000),
+                    ttl=getattr(settings, "GEMINI_CACHE_TTL", 3600),
+                )
+    return _semantic_cache
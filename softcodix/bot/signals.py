@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import PageContent
+from .passages import rebuild_passages
+from .search import index_page, unindex_page, unindex_passages
+
+
+@receiver(post_save, sender=PageContent)
+def sync_page_to_fts(sender, instance, **kwargs):
+    """Keep FTS index and passages in sync whenever a page is saved"""
+    index_page(instance)
+    rebuild_passages([instance])
+
+
+@receiver(pre_delete, sender=PageContent)
+def remove_passages_from_fts(sender, instance, **kwargs):
+    """Passages cascade-delete ho jayenge, unke FTS rows pehle hata do"""
+    unindex_passages([instance.pk])
+
+
+@receiver(post_delete, sender=PageContent)
+def remove_page_from_fts(sender, instance, **kwargs):
+    """Drop deleted pages from the FTS index"""
+    unindex_page(instance.pk)
@@ -0,0 +1,92 @@
+"""Server-side conversation state, keyed by the Dialogflow session
+
+The questionnaire answers and contact details live here instead of inside
+outputContexts. Contexts only carry a short state token and the question
+index / collect step, so every request stays the same small size however far
+the conversation got. The state also outlives the contexts' lifespan: an
+expired context can resume from the store for CONVERSATION_STATE_TTL seconds.
+"""
+import secrets
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from .models import ConversationState
+
+
+def new_token():
+    """Short id of one service flow; a restarted flow gets a new one, so stale contexts can't touch it"""
+    return secrets.token_urlsafe(6)
+
+
+class DatabaseStateStore:
+    """State rows in the app database - shared by all workers, survives restarts (one upsert per turn)"""
+
+    def __init__(self, ttl=7200):
+        self.ttl = ttl
+
+    def cutoff(self):
+        return timezone.now() - timedelta(seconds=self.ttl)
+
+    def get(self, session):
+        return (
+            ConversationState.objects.filter(session=session, updated_at__gte=self.cutoff())
+            .values_list("state", flat=True).first()
+        )
+
+    def set(self, session, state):
+        # INSERT ... ON CONFLICT DO UPDATE - ek query, pehle SELECT nahi
+        ConversationState.objects.bulk_create(
+            [ConversationState(session=session, state=state, updated_at=timezone.now())],
+            update_conflicts=True, unique_fields=["session"], update_fields=["state", "updated_at"],
+        )
+
+    def delete(self, session):
+        ConversationState.objects.filter(session=session).delete()
+
+    def purge(self):
+        """Drop abandoned conversations older than the TTL; returns how many"""
+        return ConversationState.objects.filter(updated_at__lt=self.cutoff()).delete()[0]
+
+
+class CacheStateStore:
+    """Same interface on top of a Django cache alias (e.g. redis shared by all workers)"""
+
+    def __init__(self, alias, ttl=7200):
+        self.alias = alias
+        self.ttl = ttl
+
+    def _key(self, session):
+        return f"conversation:{session}"
+
+    def get(self, session):
+        return caches[self.alias].get(self._key(session))
+
+    def set(self, session, state):
+        caches[self.alias].set(self._key(session), state, self.ttl)
+
+    def delete(self, session):
+        caches[self.alias].delete(self._key(session))
+
+    def purge(self):
+        return 0   # expiry is the cache backend's job
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """Process-wide conversation state store, configured from settings"""
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                backend = getattr(settings, "CONVERSATION_STATE_BACKEND", "db")
+                ttl = getattr(settings, "CONVERSATION_STATE_TTL", 7200)
+                if backend == "db":
+                    _state_store = DatabaseStateStore(ttl)
+                else:
+                    _state_store = CacheStateStore(backend, ttl)
+    return _state_store
@@ -1,3 +1,708 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import pickle
+import random
+import sys
+import smtplib
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .deadline import Deadline, db_deadline
+from .deferred import CacheResultStore
+from .emails import build_lead_messages, lead_context
+from .fakes import FakeGeminiServer, LatencyDistribution
+from .leads import export_lines, save_lead
+from .llm_cache import LRUCache, get_response_cache, is_error_reply, make_key
+from .management.commands.bench_crawl import make_handler
+from .management.commands.load_test import conversation_script
+from .models import ConversationState, Lead, LeadOutbox, PageContent
+from .outbox import drain
+from .replay import bot_log_level, check_thresholds, format_report, load_corpus, replay, stubbed_gemini, summarize
+from .retrieval import BUILDS_DIR, VectorIndex, build_index, index_version
+from .search import search_passages
+from .web_scrap import PageBuffer, scrape_all_pages
+from .state_store import CacheStateStore, DatabaseStateStore, get_state_store
+from .conversation import HELPLINE, SERVICE_QUESTIONS, KeywordMatcher, LLMFollowup, LLMTurn, WebhookTurn, detect_service_from_query
+from .jsoncodec import CODECS
+from .logs import BackgroundQueueHandler, SampleDebugFilter
+from .metrics import BUCKETS, METRICS, Histogram
+from .views import BUSY_REPLY, HOLDING_REPLY, handle_webhook_turn, send_lead_email
 
-# Create your tests here.
+
+def webhook_body(query, intent, contexts=None, parameters=None):
+    return {
+        "session": "projects/test/agent/sessions/test-session",
+        "queryResult": {
+            "queryText": query,
+            "intent": {"displayName": intent},
+            "parameters": parameters or {},
+            "outputContexts": contexts or [],
+        },
+    }
+
+
+class WebhookDeadlineTests(TestCase):
+    def setUp(self):
+        self.index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.index_dir.cleanup)
+
+    def post(self, body):
+        return self.client.post("/webhook/", data=json.dumps(body), content_type="application/json")
+
+    def test_slow_gemini_answers_within_budget(self):
+        with FakeGeminiServer(latency=3.0) as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            WEBHOOK_BUDGET=1.0,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ):
+            start = time.monotonic()
+            response = self.post(webhook_body("slow deadline question one", "LLMQueryIntent"))
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(response.json()["fulfillmentText"], BUSY_REPLY)
+        # Timed-out Gemini call is abandoned, not joined
+        self.assertLess(elapsed, 1.3)
+
+    def test_fast_gemini_reply_is_returned(self):
+        with FakeGeminiServer(latency=0.01, reply="fast answer") as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            WEBHOOK_BUDGET=1.0,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ):
+            response = self.post(webhook_body("fast deadline question two", "LLMQueryIntent"))
+
+        self.assertEqual(response.json()["fulfillmentText"], "fast answer")
+
+    async def test_async_webhook_answers_within_budget(self):
+        with FakeGeminiServer(latency=3.0) as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            WEBHOOK_BUDGET=1.0,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ):
+            start = time.monotonic()
+            response = await self.async_client.post(
+                "/webhook-async/",
+                data=json.dumps(webhook_body("slow async question three", "LLMQueryIntent")),
+                content_type="application/json",
+            )
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(json.loads(response.content)["fulfillmentText"], BUSY_REPLY)
+        self.assertLess(elapsed, 1.3)
+
+    def test_slow_answer_is_deferred_to_followup_event(self):
+        with FakeGeminiServer(latency=0.5, reply="deferred answer") as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            LLM_DEFER_AFTER=0.1,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ):
+            start = time.monotonic()
+            first = self.post(webhook_body("deferred question four", "LLMQueryIntent")).json()
+            self.assertLess(time.monotonic() - start, 0.4)
+            followup = self.post(webhook_body("LLM_ANSWER_READY", "LLMFollowupIntent", parameters={"attempt": 1}))
+
+        self.assertEqual(first["fulfillmentText"], HOLDING_REPLY)
+        self.assertEqual(first["followupEventInput"]["name"], "LLM_ANSWER_READY")
+        self.assertEqual(followup.json(), {"fulfillmentText": "deferred answer"})
+
+    async def test_async_slow_answer_is_deferred_to_followup_event(self):
+        with FakeGeminiServer(latency=0.5, reply="async deferred answer") as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            LLM_DEFER_AFTER=0.1,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ):
+            bodies = [
+                webhook_body("async deferred question five", "LLMQueryIntent"),
+                webhook_body("LLM_ANSWER_READY", "LLMFollowupIntent", parameters={"attempt": 1}),
+            ]
+            first, followup = [
+                json.loads((await self.async_client.post(
+                    "/webhook-async/", data=json.dumps(body), content_type="application/json"
+                )).content)
+                for body in bodies
+            ]
+
+        self.assertIn("followupEventInput", first)
+        self.assertEqual(followup, {"fulfillmentText": "async deferred answer"})
+
+    async def test_async_answer_is_cached_in_a_django_cache_backend(self):
+        caches = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                  "llm": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "bot_test_llm_cache"}}
+        body = webhook_body("async shared cache question", "LLMQueryIntent")
+        with FakeGeminiServer(reply="shared cache answer") as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            GEMINI_CACHE_BACKEND="llm",
+            CACHES=caches,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ), mock.patch("bot.llm_cache._response_cache", None):
+            await sync_to_async(call_command)("createcachetable", "bot_test_llm_cache")
+            response = await self.async_client.post(
+                "/webhook-async/", data=json.dumps(body), content_type="application/json"
+            )
+            cached = await sync_to_async(get_response_cache().get)(make_key("async shared cache question", index_version()))
+
+        self.assertEqual(json.loads(response.content), {"fulfillmentText": "shared cache answer"})
+        self.assertEqual(cached, "shared cache answer")
+
+    async def test_async_deferral_uses_async_cache_api(self):
+        store = CacheResultStore("default", ttl=60)
+        blocking = {name: mock.DEFAULT for name in ("start", "put", "take", "pending", "discard", "wait")}
+        with FakeGeminiServer(latency=0.5, reply="cached deferred answer") as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            LLM_DEFER_AFTER=0.1,
+            RETRIEVAL_INDEX_DIR=self.index_dir.name,
+        ), mock.patch("bot.views.get_result_store", return_value=store), \
+                mock.patch.multiple(store, **blocking) as sync_calls:
+            replies = []
+            for body in [webhook_body("async cache question six", "LLMQueryIntent"),
+                         webhook_body("LLM_ANSWER_READY", "LLMFollowupIntent", parameters={"attempt": 1})]:
+                response = await self.async_client.post(
+                    "/webhook-async/", data=json.dumps(body), content_type="application/json"
+                )
+                replies.append(json.loads(response.content))
+
+        self.assertEqual(replies[1], {"fulfillmentText": "cached deferred answer"})
+        self.assertFalse(any(call.called for call in sync_calls.values()))
+
+    def test_expired_deadline_interrupts_db_lookup(self):
+        PageContent.objects.create(url="https://example.com/a", content="deadline passage " * 50)
+        deadline = Deadline(0)
+        with self.assertRaises(OperationalError):
+            with db_deadline(deadline, every=1):
+                search_passages("deadline passage")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", LEAD_EMAIL="leads@example.com")
+class ResponseCacheTests(TestCase):
+    def test_lru_ttl_eviction_and_counters(self):
+        cache = LRUCache(maxsize=2, ttl=10)
+        with mock.patch("bot.llm_cache.time.monotonic", return_value=100.0) as clock:
+            cache.set("a", "A")
+            cache.set("b", "B")
+            self.assertEqual(cache.get("a"), "A")   # "a" is now the most recent
+            cache.set("c", "C")                     # evicts "b"
+            self.assertIsNone(cache.get("b"))
+            clock.return_value = 111.0
+            self.assertIsNone(cache.get("a"))       # past its TTL
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["expired"], stats["size"]),
+                         (1, 2, 1, 1, 1))
+
+    def test_error_replies_are_never_cached(self):
+        for reply in ["⚠️ Gemini error: 500", "⚠️ Gemini exception: timeout", BUSY_REPLY, HOLDING_REPLY, ""]:
+            self.assertTrue(is_error_reply(reply), reply)
+        self.assertFalse(is_error_reply("Website 50k se start hoti hai"))
+
+        with tempfile.TemporaryDirectory() as index_dir, FakeGeminiServer(error_rate=1.0) as fake, override_settings(
+            GEMINI_API_BASE=fake.base_url,
+            GEMINI_API_KEY="test",
+            RETRIEVAL_INDEX_DIR=index_dir,
+        ):
+            body = json.dumps(webhook_body("failing gemini cache question", "LLMQueryIntent"))
+            for _ in range(2):
+                response = self.client.post("/webhook/", data=body, content_type="application/json")
+                self.assertTrue(response.json()["fulfillmentText"].startswith("⚠️ Gemini error"))
+        self.assertEqual(fake.requests, 2)   # second ask went to Gemini again, nothing was cached
+
+
+class LeadOutboxTests(TestCase):
+    def submit_lead(self, email="ali@example.com"):
+        context = {
+            "name": "projects/test/agent/sessions/test-session/contexts/collect-details",
+            "parameters": {"step": "email", "service": "website", "answers": {}, "name": "Ali", "phone": "0300"},
+        }
+        body = webhook_body(email, "collect-contact-details", contexts=[context])
+        return self.client.post("/webhook/", data=json.dumps(body), content_type="application/json")
+
+    def test_webhook_only_queues_the_lead(self):
+        response = self.submit_lead()
+
+        self.assertIn("Thank you Ali", response.json()["fulfillmentText"])
+        self.assertEqual(len(mail.outbox), 0)
+        entry = LeadOutbox.objects.get()
+        self.assertEqual((entry.status, entry.payload["email"]), (LeadOutbox.PENDING, "ali@example.com"))
+
+    def test_lead_is_stored_and_exported(self):
+        context = {
+            "name": "projects/test/agent/sessions/test-session/contexts/collect-details",
+            "parameters": {
+                "step": "email", "service": "website", "name": "Ali", "phone": "0300",
+                "answers": {"What type of website do you need?": "Shop, with \"cart\""},
+            },
+        }
+        body = webhook_body("ali@example.com", "collect-contact-details", contexts=[context])
+        self.client.post("/webhook/", data=json.dumps(body), content_type="application/json")
+
+        lead = Lead.objects.get()
+        self.assertEqual((lead.service, lead.name, lead.email), ("website", "Ali", "ali@example.com"))
+        csv_rows = list(export_lines("csv"))
+        self.assertEqual(len(csv_rows), 2)
+        self.assertIn('What type of website do you need?: Shop, with ""cart""', csv_rows[1])
+        record = json.loads(next(export_lines("jsonl")))
+        self.assertEqual(record["answers"], [{"question": "What type of website do you need?", "answer": 'Shop, with "cart"'}])
+        out = io.StringIO()
+        call_command("export_leads", "--format", "jsonl", stdout=out)
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], [record])
+
+    def test_worker_sends_queued_lead(self):
+        self.submit_lead()
+        totals = drain(once=True)
+
+        self.assertEqual(totals["sent"], 1)
+        self.assertEqual(len(mail.outbox), 2)   # company + user email
+        self.assertEqual(LeadOutbox.objects.get().status, LeadOutbox.SENT)
+
+    @override_settings(OUTBOX_BACKOFF_BASE=0)
+    def test_smtp_failures_retry_then_dead_letter(self):
+        self.submit_lead()
+        smtp_down = smtplib.SMTPServerDisconnected("down")
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=smtp_down):
+            first = drain(once=True, max_attempts=2)
+            self.assertEqual(LeadOutbox.objects.get().status, LeadOutbox.PENDING)
+            second = drain(once=True, max_attempts=2)
+
+        self.assertEqual((first["pending"], second["dead"]), (1, 1))
+        entry = LeadOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), (LeadOutbox.DEAD, 2))
+        self.assertIn("SMTPServerDisconnected", entry.last_error)
+
+    def test_invalid_email_is_dead_lettered_without_retry(self):
+        # The webhook re-prompts for such an address; older rows can still carry one
+        save_lead({"service": "website", "name": "Ali", "phone": "0300", "email": "not-an-email", "answers": {}})
+        drain(once=True)
+
+        self.assertEqual(LeadOutbox.objects.get().status, LeadOutbox.DEAD)
+
+
+@override_settings(LEAD_EMAIL="leads@example.com")
+class LeadEmailTemplateTests(TestCase):
+    def test_html_in_answers_cannot_break_layout(self):
+        hostile = '</p></div></body><script>alert("x")</script><div style="display:none">'
+        context = lead_context("website", "Ali <b>\nBcc: x@evil.com", "0300", "ali@example.com", {"Budget?": hostile})
+        company, user = build_lead_messages(context)
+        html = company.alternatives[0][0]
+
+        self.assertNotIn("<script>", html)
+        self.assertIn("&lt;script&gt;", html)
+        self.assertEqual(html.count("<div"), html.count("</div>"))
+        self.assertEqual(html.count("</body>"), 1)
+        # Plain-text part comes from the same template, unescaped; subject stays one header line
+        self.assertIn(hostile, company.body)
+        self.assertNotIn("\n", company.subject)
+        self.assertEqual(user.to, ["ali@example.com"])
+
+    def test_info_log_carries_no_lead_details(self):
+        lead = {"service": "website", "name": "Ali Khan", "phone": "0300", "email": "ali@example.com",
+                "answers": {"Budget?": "secret budget"}}
+        with self.assertLogs("bot.views", "INFO") as logs:
+            self.assertTrue(send_lead_email(lead))
+        self.assertNotIn("lead", logs.records[0].__dict__)
+        self.assertNotIn("Ali Khan", "".join(logs.output))
+
+
+def service_ctx(service, index, answers=None):
+    return {
+        "name": f"projects/test/agent/sessions/test-session/contexts/{service}-context",
+        "lifespanCount": 20,
+        "parameters": {"service": service, "question_index": index, "answers": answers or {}},
+    }
+
+
+def collect_ctx(step, **extra):
+    return {
+        "name": "projects/test/agent/sessions/test-session/contexts/collect-details",
+        "lifespanCount": 10,
+        "parameters": {"service": "website", "answers": {"Q": "A"}, "step": step, **extra},
+    }
+
+
+WEBSITE = SERVICE_QUESTIONS["website"]
+FALLBACK = "Default Fallback Intent"
+CC = "collect-contact-details"
+
+# (label, body, expected reply prefix or result type, expected output context suffix, expected context params)
+TRANSITION_MATRIX = [
+    ("inquiry starts flow", webhook_body("website chahiye", "website-inquiry"),
+     "Great! Aap WEBSITE", "website-context", {"question_index": 1}),
+    ("inquiry restarts same flow", webhook_body("website", "website-inquiry", [service_ctx("website", 3)]),
+     "Great! Aap WEBSITE", "website-context", {"question_index": 1}),
+    ("inquiry during other flow answers it", webhook_body("web", "website-inquiry", [service_ctx("design", 1)]),
+     SERVICE_QUESTIONS["design"][1], "design-context", {"question_index": 2}),
+    ("service-questions next question", webhook_body("Shop", "service-questions", [service_ctx("website", 1)]),
+     WEBSITE[1], "website-context", {"question_index": 2}),
+    ("service-questions last -> contact", webhook_body("50k", "service-questions", [service_ctx("website", 3)]),
+     "Perfect! 🎯", "collect-details", {"step": "name"}),
+    ("service-questions without context", webhook_body("x", "service-questions"),
+     "⚠️ Session expired. Please select service again.", None, None),
+    ("contact intent without context", webhook_body("x", CC),
+     "⚠️ Session expired. Please start again.", None, None),
+    ("contact intent name from entity", webhook_body("me", CC, [collect_ctx("name")], {"person": {"name": "Sara"}}),
+     "Thanks Sara!", "collect-details", {"step": "phone"}),
+    ("contact intent phone", webhook_body("0300", CC, [collect_ctx("phone", name="Sara")], {"phone-number": "0300"}),
+     "Great! 📱", "collect-details", {"step": "email"}),
+    ("contact intent email saves lead", webhook_body("s@example.com", CC, [collect_ctx("email", name="Sara", phone="0300")],
+     {"name": "Entity Name"}), "Perfect! ✅\n\nThank you Entity Name!", None, None),
+    ("contact intent unknown step", webhook_body("x", CC, [collect_ctx("done")]),
+     "⚠️ Session expired. Please start again.", None, None),
+    ("fallback in service flow", webhook_body("Blog", FALLBACK, [service_ctx("website", 1)]),
+     WEBSITE[1], "website-context", {"question_index": 2}),
+    ("fallback contact without step", webhook_body("x", FALLBACK, [collect_ctx("")]),
+     "⚠️ Session expired. Please start again.", None, None),
+    ("fallback name too short", webhook_body("A", FALLBACK, [collect_ctx("name")]),
+     "⚠️ Please enter a valid name", None, None),
+    ("fallback name", webhook_body("Sara", FALLBACK, [collect_ctx("name")]),
+     "Thanks Sara!", "collect-details", {"step": "phone"}),
+    ("fallback phone too short", webhook_body("0300", FALLBACK, [collect_ctx("phone", name="Sara")]),
+     "⚠️ Please enter a valid phone number", None, None),
+    ("fallback phone", webhook_body("03001234567", FALLBACK, [collect_ctx("phone", name="Sara")]),
+     "Great! 📱", "collect-details", {"step": "email"}),
+    ("fallback email without @", webhook_body("s at example", FALLBACK, [collect_ctx("email", name="Sara", phone="0300")]),
+     "⚠️ Please enter a valid email", "collect-details", {"step": "email"}),
+    ("fallback email saves lead", webhook_body("s@example.com", FALLBACK, [collect_ctx("email", name="Sara", phone="0300")],
+     {"name": "Entity Name"}), "Perfect! ✅\n\nThank you Sara!", None, None),
+    ("fallback unknown step -> keywords", webhook_body("logo banana hai", FALLBACK, [collect_ctx("done")]),
+     "Great! Aap DESIGN", "design-context", {"question_index": 1}),
+    ("fallback keyword starts flow", webhook_body("mujhe app chahiye", FALLBACK),
+     "Great! Aap MOBILE APP", "mobile-app-context", {"question_index": 1}),
+    ("fallback without keyword -> LLM", webhook_body("kya haal hai", FALLBACK), LLMTurn, None, None),
+    ("helpline", webhook_body("number?", "helpline"), "📞 Our helpline number", None, None),
+    ("LLM intent", webhook_body("what do you do", "LLMQueryIntent"), LLMTurn, None, None),
+    ("deferred answer follow-up", webhook_body("LLM_ANSWER_READY", "LLMFollowupIntent", parameters={"attempt": 2}),
+     LLMFollowup, None, None),
+    ("unknown intent -> LLM", webhook_body("hmm", "Some Other Intent"), LLMTurn, None, None),
+]
+
+
+class ConversationTransitionTests(TestCase):
+    def test_turn_indexes_contexts_by_exact_short_name(self):
+        lookalike = {"name": "projects/test/agent/sessions/test-session/contexts/old-website-context", "lifespanCount": 2}
+        turn = WebhookTurn(webhook_body("x", FALLBACK, [lookalike, service_ctx("mobile-app", 2), collect_ctx("phone")]))
+        self.assertEqual(turn.service, "mobile-app")
+        self.assertEqual(turn.service_params["question_index"], 2)
+        self.assertEqual(turn.collect_params["step"], "phone")
+        self.assertEqual(turn.lifespans, {"old-website-context": 2, "mobile-app-context": 20, "collect-details": 10})
+
+    def test_transition_matrix(self):
+        for label, body, expected, context_suffix, context_params in TRANSITION_MATRIX:
+            with self.subTest(label):
+                get_state_store().delete(body["session"])   # every row starts without server-side state
+                result = handle_webhook_turn(json.loads(json.dumps(body)))
+                if isinstance(expected, type):
+                    self.assertIsInstance(result, expected)
+                    continue
+                data = json.loads(result.content)
+                text = data.get("fulfillmentText") or data["fulfillmentMessages"][0]["text"]["text"][0]
+                self.assertTrue(text.startswith(expected), text)
+                contexts = data.get("outputContexts", [])
+                if context_suffix is None:
+                    self.assertEqual(contexts, [])
+                    continue
+                self.assertTrue(contexts[0]["name"].endswith(f"/contexts/{context_suffix}"))
+                for key, value in context_params.items():
+                    self.assertEqual(contexts[0]["parameters"][key], value)
+
+    def test_lead_prefers_entities_on_intent_path_and_saved_values_on_fallback(self):
+        for label, body, *_ in TRANSITION_MATRIX:
+            if "saves lead" in label:
+                handle_webhook_turn(json.loads(json.dumps(body)))
+        self.assertEqual(sorted(Lead.objects.values_list("name", flat=True)), ["Entity Name", "Sara"])
+
+
+class ConversationStateTests(TestCase):
+    SESSION = "projects/test/agent/sessions/test-session"
+
+    def turn(self, query, intent, contexts, parameters=None):
+        body = webhook_body(query, intent, contexts, parameters)
+        data = json.loads(handle_webhook_turn(json.loads(json.dumps(body))).content)
+        return len(json.dumps(body)), data
+
+    def test_contexts_carry_only_token_and_position(self):
+        mobile = SERVICE_QUESTIONS["mobile-app"]
+        sizes, (_, data) = [], self.turn("app chahiye", "mobile-app-inquiry", [])
+        for answer in ["Both", "Social network for pet owners, with chat", "10k", "Push + payments", "5 lakh"]:
+            self.assertEqual(set(data["outputContexts"][0]["parameters"]), {"question_index", "state"})
+            size, data = self.turn(answer, "service-questions", data["outputContexts"])
+            sizes.append(size)
+        self.assertEqual(data["outputContexts"][0]["parameters"], {"step": "name", "state": mock.ANY})
+        self.assertLessEqual(max(sizes) - min(sizes), 40)   # no answers riding along
+        self.assertEqual(get_state_store().get(self.SESSION)["answers"][mobile[1]], "Social network for pet owners, with chat")
+
+        for query, parameters in [("Sara", {"person": {"name": "Sara"}}), ("03001234567", {"phone-number": "03001234567"})]:
+            _, data = self.turn(query, CC, data["outputContexts"], parameters)
+        _, data = self.turn("sara@example.com", CC, data["outputContexts"])
+        self.assertTrue(data["fulfillmentText"].startswith("Perfect! ✅\n\nThank you Sara!"))
+        lead = Lead.objects.get()
+        self.assertEqual((lead.service, lead.phone, lead.answers.count()), ("mobile-app", "03001234567", 5))
+        self.assertIsNone(get_state_store().get(self.SESSION))   # lead saved, state gone
+
+    def test_invalid_email_reprompts_without_saving_the_lead(self):
+        _, data = self.turn("website chahiye", "website-inquiry", [])
+        for answer in ["Blog", "10 pages", "50k"]:
+            _, data = self.turn(answer, "service-questions", data["outputContexts"])
+        for query in ["Sara", "03001234567", "sara at example"]:
+            _, data = self.turn(query, FALLBACK, data["outputContexts"])
+        self.assertTrue(data["fulfillmentText"].startswith("⚠️ Please enter a valid email"))
+        self.assertEqual(data["outputContexts"][0]["parameters"]["step"], "email")
+        self.assertFalse(Lead.objects.exists())
+
+        _, data = self.turn("sara@example.com", FALLBACK, data["outputContexts"])
+        self.assertTrue(data["fulfillmentText"].startswith("Perfect! ✅\n\nThank you Sara!"))
+        self.assertEqual(Lead.objects.get().email, "sara@example.com")
+
+    def test_flow_resumes_after_contexts_expire(self):
+        _, data = self.turn("website chahiye", "website-inquiry", [])
+        _, data = self.turn("Blog", "service-questions", data["outputContexts"])
+        _, data = self.turn("10 pages", "service-questions", [])   # lifespan khatam, contexts nahi aaye
+        self.assertEqual(data["fulfillmentText"], WEBSITE[2])
+        self.assertEqual(data["outputContexts"][0]["parameters"]["question_index"], 3)
+        self.assertEqual(get_state_store().get(self.SESSION)["answers"], {WEBSITE[0]: "Blog", WEBSITE[1]: "10 pages"})
+
+    def test_resume_only_into_the_same_phase(self):
+        _, data = self.turn("website chahiye", "website-inquiry", [])
+        _, data = self.turn("Sara", CC, [], {"person": {"name": "Sara"}})   # state still in the questions
+        self.assertEqual(data["fulfillmentText"], "⚠️ Session expired. Please start again.")
+
+        for answer in ["Blog", "10 pages", "50k"]:
+            _, data = self.turn(answer, "service-questions", data.get("outputContexts", []))
+        self.assertEqual(get_state_store().get(self.SESSION)["step"], "name")
+        _, data = self.turn("20 pages", "service-questions", [])   # questionnaire already done
+        self.assertEqual(data["fulfillmentText"], "⚠️ Session expired. Please select service again.")
+        self.assertEqual(get_state_store().get(self.SESSION)["answers"][WEBSITE[1]], "10 pages")
+
+    def test_context_from_an_older_flow_is_expired(self):
+        _, old = self.turn("website chahiye", "website-inquiry", [])
+        self.turn("website", "website-inquiry", [])   # restarted: new token
+        _, data = self.turn("Blog", "service-questions", old["outputContexts"])
+        self.assertEqual(data["fulfillmentText"], "⚠️ Session expired. Please select service again.")
+
+    def test_stores(self):
+        for store in (DatabaseStateStore(ttl=60), CacheStateStore("default", ttl=60)):
+            with self.subTest(type(store).__name__):
+                store.set(self.SESSION, {"token": "a", "answers": {}})
+                store.set(self.SESSION, {"token": "b", "answers": {"Q": "A"}})
+                self.assertEqual(store.get(self.SESSION), {"token": "b", "answers": {"Q": "A"}})
+                store.delete(self.SESSION)
+                self.assertIsNone(store.get(self.SESSION))
+        store = DatabaseStateStore(ttl=60)
+        store.set(self.SESSION, {"token": "a"})
+        ConversationState.objects.update(updated_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(store.get(self.SESSION))
+        self.assertEqual(store.purge(), 1)
+
+
+class PageBufferTests(TestCase):
+    def test_failed_batch_is_dropped_not_retried(self):
+        buffer = PageBuffer(batch_size=10)
+        buffer.add("https://example.com/bad", content="x")
+        with mock.patch("bot.web_scrap.index_pages", side_effect=OperationalError("disk I/O error")), \
+                self.assertLogs("bot.web_scrap", "ERROR") as logs:
+            self.assertEqual(buffer.flush(), ["https://example.com/bad"])
+        self.assertIn("https://example.com/bad", logs.records[0].urls)
+
+        buffer.add("https://example.com/good", content="y")
+        self.assertEqual(buffer.flush(), [])
+        self.assertEqual(list(PageContent.objects.values_list("url", flat=True)), ["https://example.com/good"])
+        self.assertEqual((buffer.written, buffer.failed), (1, ["https://example.com/bad"]))
+
+
+class IncrementalCrawlTests(TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(pages=5, latency=0))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.domain = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    def crawl(self):
+        stats = {}
+        scrape_all_pages(self.domain, limit=10, concurrency=2, stats=stats)
+        return stats
+
+    def test_unchanged_pages_are_skipped_without_touching_last_scraped(self):
+        first = self.crawl()
+        self.assertEqual((first["fetched"], first["unchanged"], first["written"]), (6, 0, 6))   # "/" + 5 pages
+        long_ago = timezone.now() - timedelta(days=3)
+        PageContent.objects.update(last_scraped=long_ago)
+
+        # ETag stored -> If-None-Match -> 304
+        second = self.crawl()
+        self.assertEqual((second["unchanged"], second["written"]), (first["fetched"], 0))
+
+        # No ETag stored -> full 200, but the body hash matches; only the validators are refreshed
+        PageContent.objects.update(etag="")
+        third = self.crawl()
+        self.assertEqual((third["unchanged"], third["written"]), (first["fetched"], 0))
+        self.assertFalse(PageContent.objects.filter(etag="").exists())
+        self.assertFalse(PageContent.objects.exclude(last_scraped=long_ago).exists())
+
+
+class RetrievalIndexTests(TestCase):
+    def test_rebuild_swaps_all_files_together(self):
+        with tempfile.TemporaryDirectory() as path:
+            build_index([(1, "website development"), (2, "mobile app")], dim=64, path=path)
+            old = VectorIndex(path)
+            for n in range(3):
+                build_index([(10 + i, f"seo marketing page {i}") for i in range(5 + n)], dim=128, path=path)
+            new = VectorIndex(path)
+            self.assertEqual((new.vectors.shape, len(new.ids), new.idf.shape), ((7, 128), 7, (128,)))
+            self.assertEqual(old.top_k("mobile app", 1)[0][0], 2)   # mapped old build stays consistent
+            self.assertEqual(len(os.listdir(os.path.join(path, BUILDS_DIR))), 2)
+
+
+class KeywordMatcherTests(TestCase):
+    def test_whole_words_only(self):
+        self.assertIsNone(detect_service_from_query("can you build a guide for the bottle shop"))
+        self.assertEqual(detect_service_from_query("UI ka kaam hai"), "design")
+        self.assertEqual(detect_service_from_query("do apps chahiye"), "mobile-app")
+
+    def test_phrases_and_scoring(self):
+        matcher = KeywordMatcher({"marketing": ["ads", "facebook ads"], "mobile-app": ["app"], "website": ["web", "site"]})
+        self.assertEqual(
+            matcher.matches("Facebook ads for my app"),
+            [(0, "facebook ads", "marketing"), (4, "app", "mobile-app")],
+        )
+        self.assertEqual(matcher.best("Facebook ads for my app"), "marketing")
+        self.assertEqual(matcher.best("app for my web"), "mobile-app")   # tie: first mention
+        self.assertEqual(matcher.best("app, web site"), "website")
+
+
+class LoadHarnessTests(TestCase):
+    def test_latency_distributions(self):
+        rng = random.Random(1)
+        self.assertEqual(LatencyDistribution("fixed:0.5")(rng), 0.5)
+        self.assertTrue(all(0.2 <= LatencyDistribution("uniform:0.2,1.5")(rng) <= 1.5 for _ in range(100)))
+        lognormal = pickle.loads(pickle.dumps(LatencyDistribution("lognormal:0.8,0.5")))   # goes to the fake's process
+        self.assertAlmostEqual(sorted(lognormal(rng) for _ in range(2001))[1000], 0.8, delta=0.1)
+        with self.assertRaises(ValueError):
+            LatencyDistribution("gamma:1,2")
+
+    def test_conversation_script_submits_a_lead(self):
+        contexts = []
+        with stubbed_gemini(), bot_log_level(logging.WARNING):
+            for _, query, intent, parameters in conversation_script(7, llm_turns=2):
+                body = webhook_body(query, intent, contexts, parameters)
+                reply = self.client.post("/webhook/", data=body, content_type="application/json").json()
+                contexts = reply.get("outputContexts", contexts)
+        self.assertTrue(reply["fulfillmentText"].startswith("Perfect! ✅"))
+        self.assertEqual(Lead.objects.get().email, "load7@example.com")
+
+
+class JsonCodecTests(TestCase):
+    def test_codecs_agree_on_webhook_bodies(self):
+        raw = json.dumps(webhook_body("mujhe website chahiye ✨", FALLBACK, [service_ctx("website", 1)])).encode()
+        for name, codec in CODECS.items():
+            with self.subTest(name):
+                body = codec.loads(raw)   # bytes in, no decode step
+                self.assertEqual(body, json.loads(raw))
+                self.assertEqual(json.loads(codec.dumps(body)), body)
+
+    def test_static_replies_are_serialized_once(self):
+        first = handle_webhook_turn(webhook_body("number?", "helpline"))
+        second = handle_webhook_turn(webhook_body("number?", "helpline"))
+        self.assertIsNot(first, second)   # fresh response objects, same pre-built bytes
+        self.assertEqual(first.content, HELPLINE.content)
+        self.assertEqual(second.content, HELPLINE.content)
+        self.assertEqual(first["Content-Type"], "application/json")
+
+
+class StructuredLoggingTests(TestCase):
+    def test_queue_handler_redacts_and_samples(self):
+        stream = io.StringIO()
+        handler = BackgroundQueueHandler(stream=stream)
+        handler.addFilter(SampleDebugFilter(rate=0))
+        logger = logging.getLogger("bot.tests.logging")
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        lead = {"name": "Sara", "phone": "03001234567", "email": "sara@example.com"}
+        try:
+            logger.debug("Sampled away")
+            logger.info("Lead from sara@example.com", extra={"lead": lead})
+            lead["phone"] = "changed after logging"
+        finally:
+            logger.removeHandler(handler)
+            handler.close()   # stops the listener, flushing the queue
+        output = stream.getvalue()
+        self.assertNotIn("Sampled away", output)
+        self.assertIn("Lead from s***@example.com", output)
+        self.assertIn('"name": "Sara", "phone": "***", "email": "***"', output)
+        self.assertNotIn("03001234567", output)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        METRICS.reset()
+
+    def test_stage_histograms_and_counters_on_metrics_route(self):
+        self.client.post("/webhook/", data=json.dumps(webhook_body("number?", "helpline")), content_type="application/json")
+        METRICS.incr("bot_gemini_timeouts_total")
+        response = self.client.get("/metrics")
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        for stage in ("parse", "dispatch", "total"):
+            self.assertIn(f'bot_stage_duration_seconds_count{{stage="{stage}",intent="helpline"}} 1', text)
+        self.assertIn('bot_stage_duration_seconds_bucket{stage="total",intent="helpline",le="+Inf"} 1', text)
+        self.assertIn('bot_stage_duration_seconds_quantile{stage="total",intent="helpline",quantile="0.99"}', text)
+        self.assertIn("bot_gemini_timeouts_total 1", text)
+
+    def test_quantiles_from_buckets(self):
+        histogram = Histogram()
+        histogram.counts[3] = 90    # (BUCKETS[2], BUCKETS[3]]
+        histogram.counts[10] = 10
+        histogram.count = 100
+        self.assertTrue(BUCKETS[2] < histogram.quantile(0.5) <= BUCKETS[3])
+        self.assertTrue(BUCKETS[9] < histogram.quantile(0.99) <= BUCKETS[10])
+
+
+@override_settings(
+    GEMINI_API_KEY="stub",
+    LLM_DEFER_AFTER=None,
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class WebhookReplayBenchmark(TestCase):
+    """Replays testdata/webhook_corpus.json through /webhook/ and fails on threshold regressions
+
+    WEBHOOK_BENCH_ROUNDS=50 gives steadier percentiles than the default;
+    WEBHOOK_BENCH_REPORT=1 prints the per-intent table.
+    """
+
+    def test_corpus_replay_within_thresholds(self):
+        corpus = load_corpus()
+        rounds = int(os.environ.get("WEBHOOK_BENCH_ROUNDS", "5"))
+        with tempfile.TemporaryDirectory() as index_dir, override_settings(RETRIEVAL_INDEX_DIR=index_dir), \
+                stubbed_gemini() as gemini:
+            samples, problems = replay(self.client, corpus, rounds=rounds)
+        summary = summarize(samples)
+        if os.environ.get("WEBHOOK_BENCH_REPORT"):
+            sys.stderr.write(f"\nwebhook replay, {rounds} rounds\n{format_report(summary)}\n")
+
+        self.assertEqual(problems, [])
+        self.assertGreater(gemini.requests, 0)
+        # Har contact flow ka lead outbox mein - drain karo to dono emails locmem mein
+        with bot_log_level(logging.WARNING):
+            drain(once=True)
+        self.assertEqual(len(mail.outbox), 2 * Lead.objects.count())
+        self.assertEqual(check_thresholds(summary, corpus["thresholds"]), [])
+        # A tighter budget must trip the check
+        self.assertIn(
+            "collect-contact-details: queries 6.00 > 1",
+            check_thresholds(summary, {"collect-contact-details": {"queries": 1}}),
+        )
@@ -1,37 +1,231 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from django.conf import settings
+from django.db import transaction
 from .models import PageContent
+from .passages import rebuild_passages
+from .search import index_pages
 
-def scrape_all_pages(domain, limit=20):
-    visited = set()
-    to_visit = [domain]
+logger = logging.getLogger(__name__)
+
+# Columns refreshed when a scraped URL already exists
+UPSERT_FIELDS = ["content", "etag", "last_modified", "content_hash", "last_scraped"]
+
+
+class HostLimiter:
+    """Per-host concurrency cap + minimum delay between requests (politeness)"""
+
+    def __init__(self, per_host, delay=0):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_at = {}
 
-    while to_visit and len(visited) < limit:
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        semaphore.acquire()
         try:
-            res = requests.get(url, timeout=5)
-            if res.status_code != 200:
-                continue
-            soup = BeautifulSoup(res.text, "html.parser")
-            text = soup.get_text(" ", strip=True)
-
-            # Save to DB
-            PageContent.objects.update_or_create(
-                url=url,
-                defaults={"content": text[:2000]}
-            )
-
-            # Extract more links
-            for link in soup.find_all("a", href=True):
-                new_url = urljoin(domain, link["href"])
-                if domain in new_url and new_url not in visited:
-                    to_visit.append(new_url)
-
-            visited.add(url)
-        except Exception as e:
-            print("Error:", e)
+            if self.delay:
+                with self._lock:
+                    now = time.monotonic()
+                    start_at = max(now, self._next_at.get(host, now))
+                    self._next_at[host] = start_at + self.delay
+                if start_at > now:
+                    time.sleep(start_at - now)
+            yield
+        finally:
+            semaphore.release()
+
+
+def make_session(pool_size):
+    """Keep-alive session whose connection pool matches the number of workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_page(session, limiter, url, domain, known=None):
+    """Download + parse one page (runs in a worker thread, no DB access here)
+
+    `known` is the (etag, last_modified, content_hash) stored from the last crawl.
+    Returns None for failed pages, {"changed": False} when the page is the same
+    as last time (304 or identical body), otherwise the parsed page.
+    """
+    etag, last_modified, content_hash = known or ("", "", "")
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    with limiter.slot(url):
+        res = session.get(url, headers=headers, timeout=5)
+    if res.status_code == 304:
+        return {"changed": False}
+    if res.status_code != 200:
+        return None
+
+    validators = {
+        "etag": res.headers.get("ETag", ""),
+        "last_modified": res.headers.get("Last-Modified", ""),
+        "content_hash": hashlib.sha256(res.content).hexdigest(),
+    }
+    if content_hash and validators["content_hash"] == content_hash:
+        # Body same hai - parse aur content write skip, sirf naye validators
+        return {"changed": False, "validators": validators}
+
+    soup = BeautifulSoup(res.text, "html.parser")
+    text = soup.get_text(" ", strip=True)
+    links = [urljoin(domain, link["href"]) for link in soup.find_all("a", href=True)]
+    return {"changed": True, "text": text, "links": links, "validators": validators}
+
+
+class PageBuffer:
+    """Collect scraped pages and upsert them in batches, one transaction per batch
+
+    `written` counts pages whose batch committed, `failed` lists the URLs of
+    dropped batches.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.written = 0
+        self.failed = []
+
+    def add(self, url, **fields):
+        self.pending[url] = PageContent(url=url, **fields)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the pending batch; returns its URLs if it failed (logged and dropped, never retried)"""
+        if not self.pending:
+            return []
+        batch, self.pending = self.pending, {}
+        urls = list(batch)
+        try:
+            with transaction.atomic():
+                PageContent.objects.bulk_create(
+                    batch.values(),
+                    update_conflicts=True,
+                    unique_fields=["url"],
+                    update_fields=UPSERT_FIELDS,
+                )
+                pages = list(PageContent.objects.filter(url__in=urls))
+                index_pages(pages)
+                rebuild_passages(pages)
+        except Exception:
+            # Agle crawl mein yeh pages phir fetch ho jayenge
+            logger.exception("Page batch dropped", extra={"urls": urls})
+            self.failed += urls
+            return urls
+        self.written += len(urls)
+        return []
+
+
+def load_known_pages(domain):
+    """Validators from the previous crawl, keyed by URL"""
+    rows = PageContent.objects.filter(url__contains=domain).values_list(
+        "url", "etag", "last_modified", "content_hash"
+    )
+    return {url: (etag, last_modified, content_hash) for url, etag, last_modified, content_hash in rows}
+
+
+def scrape_all_pages(domain, limit=20, concurrency=None, per_host=None, delay=None,
+                     incremental=True, stats=None, batch_size=None):
+    """Crawl `domain` with up to `concurrency` fetches in flight, return visited URLs
+
+    With `incremental` the crawl sends conditional GETs and skips parsing and
+    DB writes for pages that did not change. Pass a dict as `stats` to get
+    fetched / unchanged / written / failed counters back. Pages are written in
+    batches of `batch_size` (default CRAWL_BATCH_SIZE); a batch that fails is
+    logged and counted as failed, the crawl carries on.
+    """
+    if concurrency is None:
+        concurrency = getattr(settings, "CRAWL_CONCURRENCY", 8)
+    if per_host is None:
+        per_host = getattr(settings, "CRAWL_PER_HOST", concurrency)
+    if delay is None:
+        delay = getattr(settings, "CRAWL_DELAY", 0)
+    if batch_size is None:
+        batch_size = getattr(settings, "CRAWL_BATCH_SIZE", 50)
+
+    known = load_known_pages(domain) if incremental else {}
+    if stats is None:
+        stats = {}
+    stats.update(fetched=0, unchanged=0, written=0, failed=0)
+
+    visited = set()
+    seen = {domain}
+    to_visit = deque([domain])
+    # Unchanged pages ke links parse nahi hote, is liye pichle crawl ke URLs seed kar do
+    for url in known:
+        if url not in seen:
+            seen.add(url)
+            to_visit.append(url)
+    in_flight = {}
+    limiter = HostLimiter(per_host, delay)
+    session = make_session(concurrency)
+    buffer = PageBuffer(batch_size)
+
+    with session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while to_visit or in_flight:
+            # Queue bharte raho jab tak slots aur limit allow kare
+            while to_visit and len(in_flight) < concurrency and len(visited) + len(in_flight) < limit:
+                url = to_visit.popleft()
+                future = executor.submit(fetch_page, session, limiter, url, domain, known.get(url))
+                in_flight[future] = url
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    stats["fetched"] += 1
+
+                    if not result["changed"]:
+                        stats["unchanged"] += 1
+                        validators = result.get("validators")
+                        if validators and (validators["etag"], validators["last_modified"]) != known[url][:2]:
+                            # .update() last_scraped (auto_now) ko touch nahi karta
+                            PageContent.objects.filter(url=url).update(**validators)
+                        visited.add(url)
+                        continue
+
+                    # Extract more links - DB write se pehle, taake frontier kabhi na sukde
+                    for new_url in result["links"]:
+                        if domain in new_url and new_url not in seen:
+                            seen.add(new_url)
+                            to_visit.append(new_url)
+                    visited.add(url)
+
+                    # Save to DB (main thread only, batched)
+                    buffer.add(url, content=result["text"], **result["validators"])
+                except Exception:
+                    logger.exception("Page failed", extra={"url": url})
+
+        buffer.flush()
+    stats["written"], stats["failed"] = buffer.written, len(buffer.failed)
 
     return visited
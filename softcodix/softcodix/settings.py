@@ -134,12 +134,104 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_HOST_USER = 'xcapalerts@gmail.com'
 EMAIL_HOST_PASSWORD = 'wroszlkwftjiagvd'
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '1') == '1'
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 LEAD_EMAIL = 'queries@softcodix.com'
 
 
+# Full-text search (SQLite FTS5) - kitne pages return karne hain
+SEARCH_TOP_K = 3
+
+# Crawler - parallel fetches, per-host cap aur politeness delay (seconds)
+CRAWL_CONCURRENCY = 8
+CRAWL_PER_HOST = 8
+CRAWL_DELAY = 0
+CRAWL_BATCH_SIZE = 50   # pages per bulk upsert transaction
+
+# Passages - page text ko overlapping chunks (characters) mein store karo
+PASSAGE_SIZE = 600
+PASSAGE_OVERLAP = 150
+
+# Local vector retrieval (hashed n-grams, numpy) for the Gemini prompt context
+RETRIEVAL_INDEX_DIR = BASE_DIR / "retrieval_index"
+RETRIEVAL_DIM = 384
+RETRIEVAL_TOP_K = 4
+RETRIEVAL_MIN_SCORE = 0.1
+RETRIEVAL_CONTEXT_CHARS = 2000
+
+# Gemini response cache - "local" (per-process LRU) ya koi CACHES alias (shared across workers)
+GEMINI_CACHE_BACKEND = "local"
+GEMINI_CACHE_SIZE = 1000
+GEMINI_CACHE_TTL = 60 * 60
+# Near-duplicate (paraphrase) cache - Jaccard similarity threshold on query shingles
+SEMANTIC_CACHE_THRESHOLD = 0.7
+SEMANTIC_CACHE_SIZE = 5000
+
+# Gemini HTTP client - endpoint, pooled connections aur long-lived executor size
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")   # load_test fakes ke liye override
+GEMINI_MODEL = "gemini-2.5-flash-lite"
+LLM_POOL_SIZE = 10     # keep-alive connections (match worker threads)
+LLM_MAX_WORKERS = 10   # concurrent outbound LLM calls per process
+LLM_MAX_QUEUE = 20     # extra calls allowed to wait before "Server busy"
+
+# Latency budget per webhook turn (Dialogflow gives up at 5 s)
+WEBHOOK_BUDGET = 4.5
+GEMINI_TIMEOUT = 4
+LLM_MIN_BUDGET = 0.3   # isse kam time bacha ho to Gemini call hi mat karo
+LLM_ASYNC_MAX_CONNECTIONS = 200   # async webhook: concurrent Gemini calls per worker loop
+LLM_ASYNC_SHARD_SIZE = 10          # connections per httpx client shard
+
+# Deferred LLM answers: Gemini LLM_DEFER_AFTER s se zyada le to holding message + follow-up event.
+# Needs a Dialogflow intent (LLM_FOLLOWUP_INTENT) triggered by LLM_FOLLOWUP_EVENT with webhook enabled.
+LLM_DEFER_AFTER = None            # e.g. 2.0 - None keeps the single-hit behaviour
+LLM_DEFERRED_TIMEOUT = 10         # background Gemini call timeout once deferred
+LLM_FOLLOWUP_EVENT = "LLM_ANSWER_READY"
+LLM_FOLLOWUP_INTENT = "LLMFollowupIntent"
+LLM_FOLLOWUP_MAX = 2              # follow-up hits before giving up with "Server busy"
+LLM_RESULT_BACKEND = "local"      # ya CACHES alias, jab follow-up kisi aur worker par aa sakta ho
+LLM_RESULT_TTL = 120
+
+# Lead email outbox - `manage.py process_outbox` worker
+OUTBOX_CONCURRENCY = 4        # emails in flight per worker
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 6       # phir dead-letter (status "dead", admin mein dikhta hai)
+OUTBOX_BACKOFF_BASE = 30      # seconds, doubles per failed attempt
+OUTBOX_BACKOFF_CAP = 3600
+OUTBOX_LEASE = 300            # claimed rows wapas due ho jati hain agar worker crash ho jaye
+OUTBOX_POLL_INTERVAL = 2
+# SMTP connection reuse in the outbox worker (connect + STARTTLS + login ek baar per window)
+EMAIL_REUSE_WINDOW = 30           # seconds
+EMAIL_REUSE_MAX_MESSAGES = 100
+
+# Webhook JSON: "auto" = orjson agar installed ho, warna stdlib ("orjson" / "stdlib" force karta hai)
+JSON_CODEC = "auto"
+
+# Logging: bot.* loggers -> queue -> background thread (formatting, PII redaction, stderr).
+# Production mein BOT_LOG_LEVEL=INFO: debug calls sirf level check reh jati hain.
+BOT_LOG_LEVEL = os.environ.get("BOT_LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "sample_debug": {"()": "bot.logs.SampleDebugFilter", "rate": os.environ.get("BOT_LOG_DEBUG_SAMPLE", "1.0")},
+    },
+    "handlers": {
+        "bot_queue": {
+            "class": "bot.logs.BackgroundQueueHandler",
+            "as_json": os.environ.get("BOT_LOG_JSON") == "1",
+            "filters": ["sample_debug"],
+        },
+    },
+    "loggers": {
+        "bot": {"handlers": ["bot_queue"], "level": BOT_LOG_LEVEL, "propagate": False},
+    },
+}
+
+# Conversation state (service answers, contact details) - server-side, keyed by Dialogflow session.
+# "db" shared by all workers; ya koi CACHES alias (e.g. redis) agar per-turn DB query nahi chahiye
+CONVERSATION_STATE_BACKEND = "db"
+CONVERSATION_STATE_TTL = 2 * 60 * 60   # resume after context lifespan expiry, then `purge_conversation_state`
@@ -23,6 +23,9 @@ from bot import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     # path("webhook/", dialogflow_webhook, name="dialogflow_webhook")
-    path("webhook/", views.dialogflow_webhook, name="dialogflow_webhook")
-
+    path("webhook/", views.dialogflow_webhook, name="dialogflow_webhook"),
+    # Native async version - use this one when serving through asgi.py (uvicorn)
+    path("webhook-async/", views.dialogflow_webhook_async, name="dialogflow_webhook_async"),
+    # Prometheus scrape target - per-stage latency histograms + cache / Gemini counters
+    path("metrics", views.metrics, name="metrics"),
 ]